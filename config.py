@@ -1,47 +1,267 @@
 import os
-import boto3
-from sqlalchemy import create_engine
+import time
+import threading
+from dotenv import load_dotenv
+from fastapi import Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from models import Base
 
+load_dotenv()
+
 # AWS Region (Automatically set in Lambda)
 AWS_REGION = os.getenv("AWS_REGION", "ap-south-1")  # Default to ap-south-1 if not set
 
-# AWS SSM Client (Fetching secrets from AWS)
-ssm = boto3.client("ssm", region_name=AWS_REGION)
+# All secrets live under this SSM path, e.g. /printdoot/DATABASE_URL
+SSM_PARAMETER_PATH = os.getenv("SSM_PARAMETER_PATH", "/printdoot/")
+
+# How long (seconds) SSM values are trusted before being re-fetched
+SETTINGS_TTL_SECONDS = int(os.getenv("SETTINGS_TTL_SECONDS", "300"))
+
+_settings_cache = {}
+_settings_loaded_at = None
+_settings_lock = threading.Lock()
+
+# How long (seconds) reads go to the primary after the replica failed to connect
+READ_REPLICA_RETRY_SECONDS = int(os.getenv("READ_REPLICA_RETRY_SECONDS", "30"))
+
+# After a mutation, clients carry this cookie (or send the header) so their next reads
+# see their own writes instead of a possibly lagging replica
+READ_PRIMARY_COOKIE = "printdoot_read_primary"
+READ_PRIMARY_HEADER = "X-Read-Primary"
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+_async_engine = None
+_async_sessionmaker = None
+_replica_sessionmaker = None
+_replica_checked = False
+_replica_down_until = 0.0
+_sync_engine = None
+
+
+def _fetch_ssm_parameters():
+    """Fetch every parameter under SSM_PARAMETER_PATH with GetParametersByPath."""
+    # boto3 is imported lazily so processes that never reach SSM (tests, local
+    # runs with a .env file) don't pay for it on startup.
+    import boto3
+
+    ssm = boto3.client("ssm", region_name=AWS_REGION)
+    paginator = ssm.get_paginator("get_parameters_by_path")
+    parameters = {}
+    for page in paginator.paginate(Path=SSM_PARAMETER_PATH, Recursive=True, WithDecryption=True):
+        for parameter in page["Parameters"]:
+            name = parameter["Name"][len(SSM_PARAMETER_PATH):]
+            parameters[name] = parameter["Value"]
+    return parameters
+
+
+def get_settings(force_refresh=False):
+    """Return the cached SSM parameters, loading them on first use or after the TTL expires."""
+    global _settings_cache, _settings_loaded_at
+
+    with _settings_lock:
+        expired = (
+            _settings_loaded_at is None
+            or time.monotonic() - _settings_loaded_at > SETTINGS_TTL_SECONDS
+        )
+        if force_refresh or expired:
+            try:
+                _settings_cache = _fetch_ssm_parameters()
+            except Exception as e:
+                # Keep serving the last known values if SSM is briefly unavailable
+                if _settings_loaded_at is None:
+                    raise
+                print(f"Failed to refresh settings from SSM, using cached values. Error: {e}")
+            _settings_loaded_at = time.monotonic()
+        return dict(_settings_cache)
+
+
+def get_setting(name, default=None):
+    """
+    Resolve a single setting.
+
+    Environment variables (including values loaded from .env) take precedence,
+    so local runs and tests never need to reach SSM.
+    """
+    value = os.getenv(name)
+    if value is not None:
+        return value
+    return get_settings().get(name, default)
+
+
+def get_database_url():
+    database_url = get_setting("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError(f"DATABASE_URL is not set in the environment or under {SSM_PARAMETER_PATH}")
+    return database_url
+
+
+# Connection pool profiles for the async engine.
+# "lambda": one request per container at a time, so keep the pool tiny and make sure
+#           connections that sat idle between warm invocations are checked and recycled.
+# "server": long-running uvicorn process serving many concurrent requests.
+ENGINE_PROFILES = {
+    "lambda": {
+        "pool_size": 1,
+        "max_overflow": 2,
+        "pool_timeout": 10,
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 10000,
+        "prepared_statement_cache_size": 100,
+    },
+    "server": {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 15000,
+        "prepared_statement_cache_size": 500,
+    },
+}
+
+# Settings that override a single value of the selected profile
+_PROFILE_OVERRIDES = {
+    "DB_POOL_SIZE": "pool_size",
+    "DB_MAX_OVERFLOW": "max_overflow",
+    "DB_POOL_TIMEOUT": "pool_timeout",
+    "DB_POOL_RECYCLE": "pool_recycle",
+    "DB_STATEMENT_TIMEOUT_MS": "statement_timeout_ms",
+    "DB_PREPARED_STATEMENT_CACHE_SIZE": "prepared_statement_cache_size",
+}
+
 
-# Function to get a secure parameter from AWS SSM
-def get_ssm_secure_parameter(name):
-    response = ssm.get_parameter(Name=name, WithDecryption=True)
-    return response["Parameter"]["Value"]
+def _is_enabled(value):
+    return str(value).lower() in ("1", "true", "yes", "on")
 
-# Load sensitive parameters from AWS SSM
-DATABASE_URL = get_ssm_secure_parameter("/printdoot/DATABASE_URL")
 
-# Fix asyncpg issue in SQLAlchemy for Alembic migrations (convert asyncpg to psycopg2)
-sync_engine = create_engine(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"))
+def get_engine_profile_name():
+    """Use DB_ENGINE_PROFILE if set, otherwise pick the profile from the runtime."""
+    profile = get_setting("DB_ENGINE_PROFILE")
+    if profile:
+        return profile
+    return "lambda" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "server"
+
+
+def create_app_engine(database_url, profile=None):
+    """Create an async engine configured from a named pooling profile."""
+    profile = profile or get_engine_profile_name()
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE '{profile}', expected one of {list(ENGINE_PROFILES)}")
+
+    options = dict(ENGINE_PROFILES[profile])
+    for setting_name, option in _PROFILE_OVERRIDES.items():
+        value = get_setting(setting_name)
+        if value is not None:
+            options[option] = int(value)
+
+    # asyncpg's prepared statement cache is configured through the URL
+    url = make_url(database_url.replace("postgresql://", "postgresql+asyncpg://")).update_query_dict(
+        {"prepared_statement_cache_size": str(options.pop("prepared_statement_cache_size"))}
+    )
+    statement_timeout_ms = options.pop("statement_timeout_ms")
+
+    return create_async_engine(
+        url,
+        echo=_is_enabled(get_setting("SQL_ECHO", get_setting("DEBUG", "false"))),
+        connect_args={"server_settings": {"statement_timeout": str(statement_timeout_ms)}},
+        **options
+    )
+
+
+# Asynchronous engine for FastAPI app usage, created on first use
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_app_engine(get_database_url())
+    return _async_engine
 
-# Asynchronous engine for FastAPI app usage
-async_engine = create_async_engine(DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"), echo=True)
 
 # Async session maker for FastAPI application
-AsyncSessionLocal = sessionmaker(
-    bind=async_engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+def get_sessionmaker():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            expire_on_commit=False
+        )
+    return _async_sessionmaker
+
+
+# Session maker for the read replica, or None if DATABASE_REPLICA_URL is not configured
+def get_replica_sessionmaker():
+    global _replica_sessionmaker, _replica_checked
+    if not _replica_checked:
+        replica_url = get_setting("DATABASE_REPLICA_URL")
+        if replica_url:
+            _replica_sessionmaker = sessionmaker(
+                bind=create_app_engine(replica_url),
+                class_=AsyncSession,
+                expire_on_commit=False
+            )
+        _replica_checked = True
+    return _replica_sessionmaker
+
 
 # Function to get an async DB session for FastAPI
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async with get_sessionmaker()() as session:
+        yield session
+
+
+def wants_primary_read(request: Request):
+    """True if the client asked to read its own writes (recent mutation cookie or explicit header)."""
+    return (
+        READ_PRIMARY_COOKIE in request.cookies
+        or _is_enabled(request.headers.get(READ_PRIMARY_HEADER, "false"))
+    )
+
+
+async def open_read_session(prefer_primary=False):
+    """
+    Open a session for read-only work.
+
+    Uses the replica when one is configured and reachable, otherwise the primary.
+    A failed replica connection sends reads to the primary for READ_REPLICA_RETRY_SECONDS
+    so a down replica doesn't add a connect timeout to every request.
+    """
+    global _replica_down_until
+
+    replica_sessionmaker = get_replica_sessionmaker()
+    if replica_sessionmaker and not prefer_primary and time.monotonic() >= _replica_down_until:
+        session = replica_sessionmaker()
+        try:
+            await session.connection()
+            return session
+        except (DBAPIError, OSError) as e:
+            await session.close()
+            _replica_down_until = time.monotonic() + READ_REPLICA_RETRY_SECONDS
+            print(f"Read replica unavailable, falling back to primary. Error: {e}")
+
+    return get_sessionmaker()()
+
+
+# Function to get an async DB session for read-only FastAPI routes
+async def get_read_db(request: Request):
+    session = await open_read_session(prefer_primary=wants_primary_read(request))
+    async with session:
         yield session
 
 # Function to initialize the database (for startup scripts)
 async def init_db():
-    async with async_engine.begin() as conn:
+    async with get_async_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
 # Function to get synchronous engine for Alembic migrations
 def get_sync_engine():
-    return sync_engine
+    global _sync_engine
+    if _sync_engine is None:
+        from sqlalchemy import create_engine
+
+        # Fix asyncpg issue in SQLAlchemy for Alembic migrations (convert asyncpg to psycopg2)
+        _sync_engine = create_engine(get_database_url().replace("postgresql+asyncpg://", "postgresql://"))
+    return _sync_engine
@@ -8,9 +8,12 @@ from routers.products.reviews import reviews_router
 from routers.products.coupons import coupons_router
 from routers.orders.orders import orders_router
 from routers.featured.featured import featured_router
+from routers.uploads.uploads import uploads_router
 from mangum import Mangum
 from fastapi.responses import HTMLResponse
 from fastapi import Request, HTTPException
+from config import READ_PRIMARY_COOKIE, READ_YOUR_WRITES_SECONDS
+from utils.idempotency import idempotency_middleware
 import os
 
 app = FastAPI(
@@ -25,12 +28,29 @@ app = FastAPI(
     ],
 )
  
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """After a successful mutation, pin the client's reads to the primary for a short window."""
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE, "1",
+            max_age=READ_YOUR_WRITES_SECONDS, httponly=True, secure=True, samesite="none"
+        )
+    return response
+
+# Replay stored responses of mutations retried with the same Idempotency-Key
+app.middleware("http")(idempotency_middleware)
+
+# Added last so it is the outermost middleware: responses produced by the middlewares above
+# (e.g. an idempotency 409) carry the CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "Idempotent-Replayed"],
 )
 
 @app.get("/docs", include_in_schema=False)
@@ -106,5 +126,6 @@ app.include_router(reviews_router, tags=["Reviews"])
 app.include_router(coupons_router, tags=["Coupons"])
 app.include_router(featured_router, tags=["Featured"])
 app.include_router(orders_router, tags=["Orders"])
+app.include_router(uploads_router, tags=["Uploads"])
     
 handler = Mangum(app)
@@ -0,0 +1,38 @@
+"""add review count to products
+
+Revision ID: 3ef5d08e4020
+Revises: 7c2e9f4b1d63
+Create Date: 2026-10-16 12:20:05.602318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3ef5d08e4020'
+down_revision: Union[str, None] = '7c2e9f4b1d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('review_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from existing reviews
+    op.execute("""
+        UPDATE products p
+        SET review_count = r.review_count
+        FROM (
+            SELECT product_id, count(*) AS review_count
+            FROM product_reviews
+            GROUP BY product_id
+        ) r
+        WHERE r.product_id = p.product_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'review_count')
@@ -0,0 +1,46 @@
+"""add category product counters
+
+Revision ID: 5d0e7a3c6b18
+Revises: b81f4c2a9e57
+Create Date: 2026-10-16 14:10:55.207413
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0e7a3c6b18'
+down_revision: Union[str, None] = 'b81f4c2a9e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('category_product_counters',
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('last_number', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('category_id')
+    )
+
+    # Seed each counter past both the old count-based numbering and the highest
+    # PRNTDT{ABBR}nnn suffix already in use for the category's prefix
+    op.execute("""
+        INSERT INTO category_product_counters (category_id, last_number)
+        SELECT c.id, GREATEST(
+            (SELECT count(*) FROM products p WHERE p.category_id = c.id),
+            (SELECT coalesce(max(substr(p.product_id, length(prefix.value) + 1)::int), 0)
+             FROM products p
+             WHERE left(p.product_id, length(prefix.value)) = prefix.value
+               AND substr(p.product_id, length(prefix.value) + 1) ~ '^[0-9]+$')
+        )
+        FROM categories c
+        CROSS JOIN LATERAL (SELECT 'PRNTDT' || upper(left(c.name, 3)) AS value) prefix
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('category_product_counters')
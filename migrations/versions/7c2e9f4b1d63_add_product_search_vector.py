@@ -0,0 +1,97 @@
+"""add product search vector
+
+Revision ID: 7c2e9f4b1d63
+Revises: 0a4dc0b73543
+Create Date: 2026-10-16 11:03:27.916540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e9f4b1d63'
+down_revision: Union[str, None] = '0a4dc0b73543'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Weighted document: name (A), category name (B), material (C), description (D)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_build_search_vector(
+            p_name text, p_description text, p_material text, p_category_name text
+        ) RETURNS tsvector AS $$
+            SELECT setweight(to_tsvector('english', coalesce(p_name, '')), 'A')
+                || setweight(to_tsvector('english', coalesce(p_category_name, '')), 'B')
+                || setweight(to_tsvector('english', coalesce(p_material, '')), 'C')
+                || setweight(to_tsvector('english', coalesce(p_description, '')), 'D')
+        $$ LANGUAGE sql IMMUTABLE
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_search_vector_trigger() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := products_build_search_vector(
+                NEW.name, NEW.description, NEW.material,
+                (SELECT name FROM categories WHERE id = NEW.category_id)
+            );
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER products_search_vector_update
+        BEFORE INSERT OR UPDATE OF name, description, material, category_id ON products
+        FOR EACH ROW EXECUTE FUNCTION products_search_vector_trigger()
+    """)
+
+    # Renaming a category changes the documents of all its products
+    op.execute("""
+        CREATE OR REPLACE FUNCTION categories_search_vector_trigger() RETURNS trigger AS $$
+        BEGIN
+            UPDATE products
+            SET search_vector = products_build_search_vector(name, description, material, NEW.name)
+            WHERE category_id = NEW.id;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER categories_search_vector_update
+        AFTER UPDATE OF name ON categories
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION categories_search_vector_trigger()
+    """)
+
+    # Backfill existing products
+    op.execute("""
+        UPDATE products p
+        SET search_vector = products_build_search_vector(p.name, p.description, p.material, c.name)
+        FROM categories c
+        WHERE c.id = p.category_id
+    """)
+
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_products_name_trgm', 'products', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_name_trgm', table_name='products')
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.execute("DROP TRIGGER IF EXISTS categories_search_vector_update ON categories")
+    op.execute("DROP FUNCTION IF EXISTS categories_search_vector_trigger()")
+    op.execute("DROP TRIGGER IF EXISTS products_search_vector_update ON products")
+    op.execute("DROP FUNCTION IF EXISTS products_search_vector_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS products_build_search_vector(text, text, text, text)")
+    op.drop_column('products', 'search_vector')
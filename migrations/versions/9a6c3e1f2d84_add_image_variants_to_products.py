@@ -0,0 +1,27 @@
+"""add image variants to products
+
+Revision ID: 9a6c3e1f2d84
+Revises: 5d0e7a3c6b18
+Create Date: 2026-10-16 15:02:37.680145
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6c3e1f2d84'
+down_revision: Union[str, None] = '5d0e7a3c6b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('image_variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'image_variants')
@@ -0,0 +1,34 @@
+"""make average rating not null
+
+Revision ID: b4e7f2a9c015
+Revises: a62d8e4f1b93
+Create Date: 2026-10-17 09:12:44.301927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e7f2a9c015'
+down_revision: Union[str, None] = 'a62d8e4f1b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset cursors compare (average_rating, id) tuples, which never match NULL ratings
+    op.execute("UPDATE products SET average_rating = 0 WHERE average_rating IS NULL")
+    op.alter_column('products', 'average_rating',
+               existing_type=sa.Float(),
+               server_default='0',
+               nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('products', 'average_rating',
+               existing_type=sa.Float(),
+               server_default=None,
+               nullable=True)
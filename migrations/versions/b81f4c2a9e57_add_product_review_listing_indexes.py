@@ -0,0 +1,28 @@
+"""add product review listing indexes
+
+Revision ID: b81f4c2a9e57
+Revises: dd2943bb1f70
+Create Date: 2026-10-16 13:41:09.552810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f4c2a9e57'
+down_revision: Union[str, None] = 'dd2943bb1f70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_product_reviews_product_id_created_at_id', 'product_reviews', ['product_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_product_reviews_product_id_rating_id', 'product_reviews', ['product_id', 'rating', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_reviews_product_id_rating_id', table_name='product_reviews')
+    op.drop_index('ix_product_reviews_product_id_created_at_id', table_name='product_reviews')
@@ -0,0 +1,36 @@
+"""add stored objects
+
+Revision ID: c47d9b0e5a21
+Revises: 9a6c3e1f2d84
+Create Date: 2026-10-16 15:48:20.391752
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47d9b0e5a21'
+down_revision: Union[str, None] = '9a6c3e1f2d84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stored_objects',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_seen_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_stored_objects_last_seen_at'), 'stored_objects', ['last_seen_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_stored_objects_last_seen_at'), table_name='stored_objects')
+    op.drop_table('stored_objects')
@@ -0,0 +1,33 @@
+"""scope idempotency keys
+
+Revision ID: c8a1d5e3f247
+Revises: b4e7f2a9c015
+Create Date: 2026-10-17 10:03:27.845112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8a1d5e3f247'
+down_revision: Union[str, None] = 'b4e7f2a9c015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Stored responses only live for a day; drop them rather than guess their scope
+    op.execute("DELETE FROM idempotency_keys")
+    op.add_column('idempotency_keys', sa.Column('scope', sa.String(), nullable=False))
+    op.drop_constraint('idempotency_keys_pkey', 'idempotency_keys', type_='primary')
+    op.create_primary_key('idempotency_keys_pkey', 'idempotency_keys', ['scope', 'key'])
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM idempotency_keys")
+    op.drop_constraint('idempotency_keys_pkey', 'idempotency_keys', type_='primary')
+    op.create_primary_key('idempotency_keys_pkey', 'idempotency_keys', ['key'])
+    op.drop_column('idempotency_keys', 'scope')
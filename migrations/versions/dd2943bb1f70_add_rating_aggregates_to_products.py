@@ -0,0 +1,53 @@
+"""add rating aggregates to products
+
+Revision ID: dd2943bb1f70
+Revises: 3ef5d08e4020
+Create Date: 2026-10-16 13:02:48.114729
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dd2943bb1f70'
+down_revision: Union[str, None] = '3ef5d08e4020'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RATING_COLUMNS = ['rating_sum'] + [f'rating_{star}_count' for star in range(1, 6)]
+
+
+def upgrade() -> None:
+    for column in RATING_COLUMNS:
+        op.add_column('products', sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from existing reviews
+    op.execute("""
+        UPDATE products p
+        SET rating_sum = r.rating_sum,
+            rating_1_count = r.rating_1_count,
+            rating_2_count = r.rating_2_count,
+            rating_3_count = r.rating_3_count,
+            rating_4_count = r.rating_4_count,
+            rating_5_count = r.rating_5_count
+        FROM (
+            SELECT product_id,
+                   sum(rating) AS rating_sum,
+                   count(*) FILTER (WHERE rating = 1) AS rating_1_count,
+                   count(*) FILTER (WHERE rating = 2) AS rating_2_count,
+                   count(*) FILTER (WHERE rating = 3) AS rating_3_count,
+                   count(*) FILTER (WHERE rating = 4) AS rating_4_count,
+                   count(*) FILTER (WHERE rating = 5) AS rating_5_count
+            FROM product_reviews
+            GROUP BY product_id
+        ) r
+        WHERE r.product_id = p.product_id
+    """)
+
+
+def downgrade() -> None:
+    for column in reversed(RATING_COLUMNS):
+        op.drop_column('products', column)
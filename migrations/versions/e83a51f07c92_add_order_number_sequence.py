@@ -0,0 +1,35 @@
+"""add order number sequence
+
+Revision ID: e83a51f07c92
+Revises: c47d9b0e5a21
+Create Date: 2026-10-16 16:20:44.857310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e83a51f07c92'
+down_revision: Union[str, None] = 'c47d9b0e5a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE order_number_seq")
+    # Continue from the old counter: its current_number is the next number to hand out
+    op.execute("""
+        SELECT setval('order_number_seq', greatest((SELECT max(current_number) FROM order_counter), 1), false)
+    """)
+
+
+def downgrade() -> None:
+    # Hand the numbering back to order_counter
+    op.execute("""
+        UPDATE order_counter
+        SET current_number = (SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM order_number_seq)
+    """)
+    op.execute("DROP SEQUENCE order_number_seq")
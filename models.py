@@ -1,8 +1,8 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum, TIMESTAMP, UniqueConstraint, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum, TIMESTAMP, UniqueConstraint, Table, Index, Sequence, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.dialects.postgresql import JSONB, ARRAY
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY, TSVECTOR
 import enum
 from sqlalchemy import func
 
@@ -59,6 +59,12 @@ class Category(Base):
     image_url = Column(String, nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+# Last number handed out for generated product IDs, per category (see utils/product_id.py)
+class CategoryProductCounter(Base):
+    __tablename__ = "category_product_counters"
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    last_number = Column(Integer, nullable=False, default=0, server_default="0")
+
 # Product Model
 class Product(Base):
     __tablename__ = "products"
@@ -66,6 +72,9 @@ class Product(Base):
     product_id = Column(String, unique=True, index=True, nullable=False)
     main_image_url = Column(String, nullable=False)
     side_images_url = Column(JSONB, nullable=True)
+    # Resized variant URLs of the images above: {"main": variants, "side": [variants, ...]},
+    # variants being {format: {size: {"url", "width", "height"}}} (see utils/images.py)
+    image_variants = Column(JSONB, nullable=True)
     name = Column(String, nullable=False)
     price = Column(Integer, nullable=False)
     bulk_prices = Column(JSONB, nullable=True)  # Store quantity-price pairs, e.g. {10: 1000, 100: 100, 1000: 50}
@@ -76,12 +85,31 @@ class Product(Base):
     weight = Column(Integer, nullable=True)  # Weight in grams
     material = Column(String, nullable=True)  # Material the product is made of
     status = Column(Enum(ProductStatus), nullable=False, default=ProductStatus.in_stock)
-    average_rating = Column(Float, default=0)
+    average_rating = Column(Float, nullable=False, default=0, server_default="0")  # NOT NULL: rating sorts use keyset cursors
+    # Rating aggregates, kept in sync by the review handlers (see utils/review_stats.py)
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_1_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Maintained by a database trigger from name, category name, material and description.
+    # Deferred so regular product queries don't load it.
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     category = relationship("Category")
     order_items = relationship("OrderItem", back_populates="product")
 
+    __table_args__ = (
+        # Supports keyset pagination over (created_at, id)
+        Index('ix_products_created_at_id', 'created_at', 'id'),
+        # Full-text and typo-tolerant search on /products/filter
+        Index('ix_products_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_products_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
 # ProductReview model.
 class ProductReview(Base):
     __tablename__ = "product_reviews"
@@ -92,7 +120,12 @@ class ProductReview(Base):
     rating = Column(Integer, nullable=False)
     review_text = Column(String, nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
-    __table_args__ = (UniqueConstraint('clerkId', 'product_id', name='_clerk_product_uc'),)
+    __table_args__ = (
+        UniqueConstraint('clerkId', 'product_id', name='_clerk_product_uc'),
+        # Review listing sorts (newest / highest / lowest)
+        Index('ix_product_reviews_product_id_created_at_id', 'product_id', 'created_at', 'id'),
+        Index('ix_product_reviews_product_id_rating_id', 'product_id', 'rating', 'id'),
+    )
 
 # User Model
 class User(Base):
@@ -132,6 +165,12 @@ class Order(Base):
     items = relationship("OrderItem", back_populates="order")
     receipt = relationship("Receipt", back_populates="orders")
 
+    # Support keyset pagination over (created_at, id), overall and per user
+    __table_args__ = (
+        Index('ix_orders_created_at_id', 'created_at', 'id'),
+        Index('ix_orders_clerkId_created_at_id', 'clerkId', 'created_at', 'id'),
+    )
+
 # OrderItem Model
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -147,6 +186,10 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
 
+# Source of order numbers for generate_order_id (see utils/order.py). Replaces OrderCounter,
+# which is kept only for history: nextval() never hands out the same number twice.
+order_number_seq = Sequence("order_number_seq", metadata=Base.metadata)
+
 # OrderCounter Model
 class OrderCounter(Base):
     __tablename__ = "order_counter"
@@ -163,6 +206,45 @@ class Receipt(Base):
 
     orders = relationship("Order", back_populates="receipt")
 
+# S3 objects written by the upload helpers, for garbage collection (see utils/stored_objects.py)
+class StoredObject(Base):
+    __tablename__ = "stored_objects"
+    key = Column(String, primary_key=True)
+    sha256 = Column(String, nullable=True)
+    size = Column(Integer, nullable=True)
+    content_type = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    last_seen_at = Column(TIMESTAMP, server_default=func.now(), index=True)  # Last upload or dedup hit
+
+# Stored results of requests sent with an Idempotency-Key header (see utils/idempotency.py)
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    scope = Column(String, primary_key=True)  # Hash of method, path and caller credentials
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)  # Method, path, query and body
+    response_status = Column(Integer, nullable=True)  # NULL while the first request is still running
+    response_headers = Column(JSONB, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+
+# Side effects of committed transactions (e.g. order emails), run later by worker.py
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String, nullable=False, server_default="pending")  # pending, done or failed
+    attempts = Column(Integer, nullable=False, server_default="0")
+    available_at = Column(TIMESTAMP, nullable=False, server_default=func.now())  # Not picked up before this
+    last_error = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    processed_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        Index('ix_outbox_events_status_available_at', 'status', 'available_at'),
+    )
+
 # Featured Product Models
 
 class BestSelling(Base):
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -15,10 +15,14 @@ from routers.featured.schemas import (
     BannerCreate, BannerResponse, BannerListResponse, BannerUpdate,
     TextBannerCreate, TextBannerResponse, TextBannerListResponse, TextBannerUpdate
 )
-from config import get_db
+from config import get_db, get_read_db
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import and_
 from utils.aws import upload_base64_image_to_s3
+from utils.cache import get_cache, make_cache_key, to_cacheable, conditional_response
+from utils.pagination import apply_cursor, paginate_rows
+from utils.suggest import suggest_index
+from utils.images import build_srcset
 
 featured_router = APIRouter()
 
@@ -62,6 +66,7 @@ async def build_product_responses(db: AsyncSession, featured_products, include_c
                 price=product.price,
                 description=product.description,
                 main_image_url=product.main_image_url,
+                main_image_srcset=build_srcset((product.image_variants or {}).get("main")),
                 average_rating=product.average_rating,
                 category_name=product.category.name if include_category and product.category else None
             )
@@ -69,6 +74,41 @@ async def build_product_responses(db: AsyncSession, featured_products, include_c
             
     return responses
 
+async def fetch_featured_page(db: AsyncSession, model, skip, limit, cursor=None, include_total=True, filters=()):
+    """
+    Fetch one page of a featured section, newest first.
+
+    Uses skip/limit, or keyset pagination over (created_at, id) when a cursor is given
+    (empty for the first page). Returns (total, rows, next_cursor); total is None when
+    it was skipped in cursor mode.
+    """
+    total = None
+    if cursor is None or include_total:
+        total_result = await db.execute(select(func.count(model.id)).filter(*filters))
+        total = total_result.scalar()
+        if total == 0:
+            return 0, [], None
+
+    query = select(model).filter(*filters)
+    if cursor is not None:
+        order_columns = [model.created_at, model.id]
+        query = apply_cursor(query, order_columns, cursor, descending=True).limit(limit + 1)
+        result = await db.execute(query)
+        rows, next_cursor = paginate_rows(result.scalars().all(), limit, order_columns)
+        return total, rows, next_cursor
+
+    # Ensure skip is not greater than total
+    if skip >= total:
+        skip = max(0, total - (total % limit or limit))  # Adjust to last page
+
+    result = await db.execute(
+        query
+        .order_by(model.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return total, result.scalars().all(), None
+
 # ---------------------- BestSelling Routes ----------------------
 
 @featured_router.post("/admin/bestselling", status_code=status.HTTP_201_CREATED)
@@ -95,36 +135,27 @@ async def add_bestselling(product_ids: ProductIdList, db: AsyncSession = Depends
             continue
     
     await db.commit()
+    await get_cache().invalidate_tags("bestselling")
     return {"message": f"Added {added_count} products to bestselling successfully"}
 
 @featured_router.get("/bestselling", response_model=BestSellingListResponse)
-async def get_bestselling(skip: int = 0, limit: int = 6, db: AsyncSession = Depends(get_db)):
+async def get_bestselling(request: Request, skip: int = 0, limit: int = 6, cursor: Optional[str] = None, include_total: bool = True, db: AsyncSession = Depends(get_read_db)):
     """Get bestselling products with pagination."""
-    # Get total count
-    total_result = await db.execute(select(func.count(BestSelling.id)))
-    total = total_result.scalar()
-    
-    # Handle edge cases for pagination
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
+    total, bestselling, next_cursor = await fetch_featured_page(db, BestSelling, skip, limit, cursor, include_total)
     if total == 0:
         return {"total": 0, "products": []}
     
-    # Ensure skip is not greater than total
-    if skip >= total:
-        skip = max(0, total - (total % limit or limit))  # Adjust to last page
-    
-    # Get bestselling products with pagination
-    result = await db.execute(
-        select(BestSelling)
-        .order_by(BestSelling.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    bestselling = result.scalars().all()
-    
     # Build response with product details
     products = await build_product_responses(db, bestselling, include_category=True)
     
-    return {"total": total, "products": products}
+    entry = to_cacheable(BestSellingListResponse, {"total": total, "products": products, "next_cursor": next_cursor})
+    await get_cache().set(cache_key, entry, tags=("bestselling", "products", "categories"))
+    return conditional_response(request, entry)
 
 @featured_router.delete("/admin/bestselling/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_bestselling(product_id: str, db: AsyncSession = Depends(get_db)):
@@ -139,6 +170,7 @@ async def remove_bestselling(product_id: str, db: AsyncSession = Depends(get_db)
     
     await db.delete(bestselling)
     await db.commit()
+    await get_cache().invalidate_tags("bestselling")
     return
 
 # ---------------------- OnSale Routes ----------------------
@@ -167,36 +199,27 @@ async def add_onsale(product_ids: ProductIdList, db: AsyncSession = Depends(get_
             continue
     
     await db.commit()
+    await get_cache().invalidate_tags("onsale")
     return {"message": f"Added {added_count} products to on-sale successfully"}
 
 @featured_router.get("/onsale", response_model=OnSaleListResponse)
-async def get_onsale(skip: int = 0, limit: int = 6, db: AsyncSession = Depends(get_db)):
+async def get_onsale(request: Request, skip: int = 0, limit: int = 6, cursor: Optional[str] = None, include_total: bool = True, db: AsyncSession = Depends(get_read_db)):
     """Get on-sale products with pagination."""
-    # Get total count
-    total_result = await db.execute(select(func.count(OnSale.id)))
-    total = total_result.scalar()
-    
-    # Handle edge cases for pagination
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
+    total, onsale, next_cursor = await fetch_featured_page(db, OnSale, skip, limit, cursor, include_total)
     if total == 0:
         return {"total": 0, "products": []}
     
-    # Ensure skip is not greater than total
-    if skip >= total:
-        skip = max(0, total - (total % limit or limit))  # Adjust to last page
-    
-    # Get on-sale products with pagination
-    result = await db.execute(
-        select(OnSale)
-        .order_by(OnSale.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    onsale = result.scalars().all()
-    
     # Build response with product details
     products = await build_product_responses(db, onsale, include_category=True)
     
-    return {"total": total, "products": products}
+    entry = to_cacheable(OnSaleListResponse, {"total": total, "products": products, "next_cursor": next_cursor})
+    await get_cache().set(cache_key, entry, tags=("onsale", "products", "categories"))
+    return conditional_response(request, entry)
 
 @featured_router.delete("/admin/onsale/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_onsale(product_id: str, db: AsyncSession = Depends(get_db)):
@@ -211,6 +234,7 @@ async def remove_onsale(product_id: str, db: AsyncSession = Depends(get_db)):
     
     await db.delete(onsale)
     await db.commit()
+    await get_cache().invalidate_tags("onsale")
     return
 
 # ---------------------- Trending Routes ----------------------
@@ -239,36 +263,27 @@ async def add_trending(product_ids: ProductIdList, db: AsyncSession = Depends(ge
             continue
     
     await db.commit()
+    await get_cache().invalidate_tags("trending")
     return {"message": f"Added {added_count} products to trending successfully"}
 
 @featured_router.get("/trending", response_model=TrendingListResponse)
-async def get_trending(skip: int = 0, limit: int = 6, db: AsyncSession = Depends(get_db)):
+async def get_trending(request: Request, skip: int = 0, limit: int = 6, cursor: Optional[str] = None, include_total: bool = True, db: AsyncSession = Depends(get_read_db)):
     """Get trending products with pagination."""
-    # Get total count
-    total_result = await db.execute(select(func.count(Trending.id)))
-    total = total_result.scalar()
-    
-    # Handle edge cases for pagination
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
+    total, trending, next_cursor = await fetch_featured_page(db, Trending, skip, limit, cursor, include_total)
     if total == 0:
         return {"total": 0, "products": []}
     
-    # Ensure skip is not greater than total
-    if skip >= total:
-        skip = max(0, total - (total % limit or limit))  # Adjust to last page
-    
-    # Get trending products with pagination
-    result = await db.execute(
-        select(Trending)
-        .order_by(Trending.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    trending = result.scalars().all()
-    
     # Build response with product details
     products = await build_product_responses(db, trending, include_category=True)
     
-    return {"total": total, "products": products}
+    entry = to_cacheable(TrendingListResponse, {"total": total, "products": products, "next_cursor": next_cursor})
+    await get_cache().set(cache_key, entry, tags=("trending", "products", "categories"))
+    return conditional_response(request, entry)
 
 @featured_router.delete("/admin/trending/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_trending(product_id: str, db: AsyncSession = Depends(get_db)):
@@ -283,6 +298,7 @@ async def remove_trending(product_id: str, db: AsyncSession = Depends(get_db)):
     
     await db.delete(trending)
     await db.commit()
+    await get_cache().invalidate_tags("trending")
     return
 
 # ---------------------- NewArrivals Routes ----------------------
@@ -311,36 +327,27 @@ async def add_newarrivals(product_ids: ProductIdList, db: AsyncSession = Depends
             continue
     
     await db.commit()
+    await get_cache().invalidate_tags("newarrivals")
     return {"message": f"Added {added_count} products to new arrivals successfully"}
 
 @featured_router.get("/newarrivals", response_model=NewArrivalsListResponse)
-async def get_newarrivals(skip: int = 0, limit: int = 6, db: AsyncSession = Depends(get_db)):
+async def get_newarrivals(request: Request, skip: int = 0, limit: int = 6, cursor: Optional[str] = None, include_total: bool = True, db: AsyncSession = Depends(get_read_db)):
     """Get new arrivals products with pagination."""
-    # Get total count
-    total_result = await db.execute(select(func.count(NewArrivals.id)))
-    total = total_result.scalar()
-    
-    # Handle edge cases for pagination
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
+    total, newarrivals, next_cursor = await fetch_featured_page(db, NewArrivals, skip, limit, cursor, include_total)
     if total == 0:
         return {"total": 0, "products": []}
     
-    # Ensure skip is not greater than total
-    if skip >= total:
-        skip = max(0, total - (total % limit or limit))  # Adjust to last page
-    
-    # Get new arrivals products with pagination
-    result = await db.execute(
-        select(NewArrivals)
-        .order_by(NewArrivals.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    newarrivals = result.scalars().all()
-    
     # Build response with product details
     products = await build_product_responses(db, newarrivals, include_category=True)
     
-    return {"total": total, "products": products}
+    entry = to_cacheable(NewArrivalsListResponse, {"total": total, "products": products, "next_cursor": next_cursor})
+    await get_cache().set(cache_key, entry, tags=("newarrivals", "products", "categories"))
+    return conditional_response(request, entry)
 
 @featured_router.delete("/admin/newarrivals/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_newarrivals(product_id: str, db: AsyncSession = Depends(get_db)):
@@ -355,6 +362,7 @@ async def remove_newarrivals(product_id: str, db: AsyncSession = Depends(get_db)
     
     await db.delete(newarrival)
     await db.commit()
+    await get_cache().invalidate_tags("newarrivals")
     return
 
 # ---------------------- ShopByNeed Routes ----------------------
@@ -383,11 +391,19 @@ async def add_shopbyneed(items: ShopByNeedBulkCreate, db: AsyncSession = Depends
             continue
     
     await db.commit()
+    await get_cache().invalidate_tags("shopbyneed")
+    if added_count:
+        suggest_index.upsert("need", items.need, items.need)
     return {"message": f"Added {added_count} products to shop by need '{items.need}' successfully"}
 
 @featured_router.get("/shopbyneed", response_model=NeedsListResponse)
-async def get_needs(db: AsyncSession = Depends(get_db)):
+async def get_needs(request: Request, db: AsyncSession = Depends(get_read_db)):
     """Get list of all available needs with counts."""
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
     result = await db.execute(
         select(ShopByNeed.need, func.count(ShopByNeed.id).label("count"))
         .group_by(ShopByNeed.need)
@@ -399,39 +415,30 @@ async def get_needs(db: AsyncSession = Depends(get_db)):
         NeedResponse(need=need, count=count) for need, count in needs
     ]
     
-    return {"total": len(need_responses), "needs": need_responses}
+    entry = to_cacheable(NeedsListResponse, {"total": len(need_responses), "needs": need_responses})
+    await get_cache().set(cache_key, entry, tags=("shopbyneed",))
+    return conditional_response(request, entry)
 
 @featured_router.get("/shopbyneed/{need}", response_model=ShopByNeedListResponse)
-async def get_shopbyneed_by_need(need: str, skip: int = 0, limit: int = 6, db: AsyncSession = Depends(get_db)):
+async def get_shopbyneed_by_need(request: Request, need: str, skip: int = 0, limit: int = 6, cursor: Optional[str] = None, include_total: bool = True, db: AsyncSession = Depends(get_read_db)):
     """Get products for a specific need with pagination."""
-    # Get total count
-    total_result = await db.execute(
-        select(func.count(ShopByNeed.id)).filter(ShopByNeed.need == need)
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
+    total, shopbyneed, next_cursor = await fetch_featured_page(
+        db, ShopByNeed, skip, limit, cursor, include_total, filters=(ShopByNeed.need == need,)
     )
-    total = total_result.scalar()
-    
-    # Handle edge cases for pagination
     if total == 0:
         return {"total": 0, "products": []}
     
-    # Ensure skip is not greater than total
-    if skip >= total:
-        skip = max(0, total - (total % limit or limit))  # Adjust to last page
-    
-    # Get shop by need products with pagination
-    result = await db.execute(
-        select(ShopByNeed)
-        .filter(ShopByNeed.need == need)
-        .order_by(ShopByNeed.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    shopbyneed = result.scalars().all()
-    
     # Build response with product details
     products = await build_product_responses(db, shopbyneed, include_category=True)
     
-    return {"total": total, "products": products}
+    entry = to_cacheable(ShopByNeedListResponse, {"total": total, "products": products, "next_cursor": next_cursor})
+    await get_cache().set(cache_key, entry, tags=("shopbyneed", "products", "categories"))
+    return conditional_response(request, entry)
 
 @featured_router.delete("/admin/shopbyneed", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_shopbyneed(product_id: str, need: str, db: AsyncSession = Depends(get_db)):
@@ -454,6 +461,12 @@ async def remove_shopbyneed(product_id: str, need: str, db: AsyncSession = Depen
     
     await db.delete(shopbyneed)
     await db.commit()
+    await get_cache().invalidate_tags("shopbyneed")
+
+    # Drop the tag from suggestions once no product uses it anymore
+    remaining_result = await db.execute(select(func.count(ShopByNeed.id)).filter(ShopByNeed.need == need))
+    if remaining_result.scalar() == 0:
+        suggest_index.remove("need", need)
     return
 
 # ---------------------- Banner Routes ----------------------
@@ -478,6 +491,7 @@ async def add_banner(banner: BannerCreate, db: AsyncSession = Depends(get_db)):
         
         db.add(new_banner)
         await db.commit()
+        await get_cache().invalidate_tags("banners")
         await db.refresh(new_banner)
         
         return new_banner
@@ -488,8 +502,13 @@ async def add_banner(banner: BannerCreate, db: AsyncSession = Depends(get_db)):
         )
 
 @featured_router.get("/banners", response_model=BannerListResponse)
-async def get_banners(active_only: Optional[bool] = False, db: AsyncSession = Depends(get_db)):
+async def get_banners(request: Request, active_only: Optional[bool] = False, db: AsyncSession = Depends(get_read_db)):
     """Get all banners or only active banners if active_only is True."""
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
     try:
         # Build query based on active_only parameter
         query = select(Banner)
@@ -506,7 +525,9 @@ async def get_banners(active_only: Optional[bool] = False, db: AsyncSession = De
         result = await db.execute(query)
         banners = result.scalars().all()
         
-        return {"total": total, "banners": banners}
+        entry = to_cacheable(BannerListResponse, {"total": total, "banners": banners})
+        await get_cache().set(cache_key, entry, tags=("banners",))
+        return conditional_response(request, entry)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -529,6 +550,7 @@ async def update_banner(banner_id: int, banner: BannerUpdate, db: AsyncSession =
             setattr(db_banner, key, value)
             
         await db.commit()
+        await get_cache().invalidate_tags("banners")
         await db.refresh(db_banner)
         
         return db_banner
@@ -553,6 +575,7 @@ async def delete_banner(banner_id: int, db: AsyncSession = Depends(get_db)):
         # Delete the banner
         await db.delete(db_banner)
         await db.commit()
+        await get_cache().invalidate_tags("banners")
         
         return
     except HTTPException:
@@ -578,6 +601,7 @@ async def add_text_banner(text_banner: TextBannerCreate, db: AsyncSession = Depe
         
         db.add(new_text_banner)
         await db.commit()
+        await get_cache().invalidate_tags("text_banners")
         await db.refresh(new_text_banner)
         
         return new_text_banner
@@ -588,8 +612,13 @@ async def add_text_banner(text_banner: TextBannerCreate, db: AsyncSession = Depe
         )
 
 @featured_router.get("/text-banners", response_model=TextBannerListResponse)
-async def get_text_banners(active_only: Optional[bool] = False, db: AsyncSession = Depends(get_db)):
+async def get_text_banners(request: Request, active_only: Optional[bool] = False, db: AsyncSession = Depends(get_read_db)):
     """Get all text banners or only active text banners if active_only is True."""
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
     try:
         # Build query based on active_only parameter
         query = select(TextBanner)
@@ -606,7 +635,9 @@ async def get_text_banners(active_only: Optional[bool] = False, db: AsyncSession
         result = await db.execute(query)
         text_banners = result.scalars().all()
         
-        return {"total": total, "text_banners": text_banners}
+        entry = to_cacheable(TextBannerListResponse, {"total": total, "text_banners": text_banners})
+        await get_cache().set(cache_key, entry, tags=("text_banners",))
+        return conditional_response(request, entry)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -629,6 +660,7 @@ async def update_text_banner(text_banner_id: int, text_banner: TextBannerUpdate,
             setattr(db_text_banner, key, value)
             
         await db.commit()
+        await get_cache().invalidate_tags("text_banners")
         await db.refresh(db_text_banner)
         
         return db_text_banner
@@ -653,6 +685,7 @@ async def delete_text_banner(text_banner_id: int, db: AsyncSession = Depends(get
         # Delete the text banner
         await db.delete(db_text_banner)
         await db.commit()
+        await get_cache().invalidate_tags("text_banners")
         
         return
     except HTTPException:
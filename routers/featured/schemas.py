@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # Base schemas
@@ -89,29 +89,35 @@ class FeaturedProductResponse(FeaturedProductBase):
     price: Optional[int] = None
     description: Optional[str] = None
     main_image_url: Optional[str] = None
+    main_image_srcset: Optional[Dict[str, str]] = None  # {format: "url 160w, url 480w, ..."}
     category_name: Optional[str] = None
     average_rating: Optional[float] = None
 
 # Response lists
 class BestSellingListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     products: List[FeaturedProductResponse]
+    next_cursor: Optional[str] = None
 
 class OnSaleListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     products: List[FeaturedProductResponse]
+    next_cursor: Optional[str] = None
 
 class TrendingListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     products: List[FeaturedProductResponse]
+    next_cursor: Optional[str] = None
 
 class NewArrivalsListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     products: List[FeaturedProductResponse]
+    next_cursor: Optional[str] = None
 
 class ShopByNeedListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     products: List[FeaturedProductResponse]
+    next_cursor: Optional[str] = None
 
 # Need options response
 class NeedResponse(BaseModel):
@@ -2,128 +2,134 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File,
 from fastapi.responses import StreamingResponse, JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import asc, desc, and_
+from sqlalchemy import asc, desc, and_, insert
 from sqlalchemy.orm import selectinload
-from models import Order, OrderItem, OrderCounter, User, UserDetails, Product
-from routers.orders.schemas import OrderDetailsResponse, OrderItemResponse, OrderListResponse, OrderCreateJSON
+from models import Order, OrderItem, User, UserDetails, Product
+from routers.orders.schemas import OrderDetailsResponse, OrderItemResponse, OrderListResponse, OrderCreateJSON, CartQuoteRequest, CartQuoteResponse
 from sqlalchemy import func
 from routers.orders.schemas import OrderResponse
-from utils.aws import upload_base64_image_to_s3
-from utils.order import generate_order_id
+from utils.aws import validate_base64_image
+from utils.order import allocate_order_id
+from utils.outbox import enqueue_event
+from utils.pricing import quote_cart
+from utils.pagination import apply_cursor, paginate_rows
 from utils.pdf_generator import create_order_pdf_from_db_data
-from config import get_db
+from config import get_db, get_read_db
 import json
 import base64
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
 from utils.email_helpers import send_owner_email, send_customer_email
 
 orders_router = APIRouter()
 
-# @orders_router.post("/checkout", status_code=status.HTTP_201_CREATED)
-# async def place_order_json(
-#     order_data: OrderCreateJSON,
-#     db: AsyncSession = Depends(get_db)
-# ):
-#     # Get or create order counter
-#     counter_result = await db.execute(select(OrderCounter).limit(1))
-#     counter = counter_result.scalar()
+# Public: Place an order.
+# Everything is written in one transaction: the order number comes from order_number_seq,
+# all items are inserted with a single batched INSERT, and the side effects (customization
+# image uploads, emails) are queued in the outbox for worker.py.
+@orders_router.post("/checkout", status_code=status.HTTP_201_CREATED)
+async def place_order_json(order_data: OrderCreateJSON, db: AsyncSession = Depends(get_db)):
+    if not order_data.products:
+        raise HTTPException(status_code=400, detail="Order has no products")
 
-#     if not counter:
-#         counter = OrderCounter(current_number=1)  
-#         db.add(counter)
-#         await db.commit()
-#         await db.refresh(counter)
+    # Validate the items before allocating an order number. Images are uploaded later by the
+    # outbox worker, so reject oversized or malformed ones here while the client can still fix them.
+    for item in order_data.products:
+        if item.user_customization_type in ["image", "logo"]:
+            if not item.user_customization_value:
+                raise HTTPException(status_code=400, detail="Missing base64 image data for product.")
+            validate_base64_image(item.user_customization_value)
 
-#     # Generate order ID
-#     order_id = generate_order_id(counter.current_number)
-#     counter.current_number += 1
-#     await db.commit()
-
-#     # Validate that all products exist before creating the order
-#     product_ids = [item.product_id for item in order_data.products]
-    
-#     # Check if products exist in the database
-#     result = await db.execute(
-#         select(Product.product_id).where(Product.product_id.in_(product_ids))
-#     )
-#     existing_product_ids = {prod_id for prod_id in result.scalars().all()}
-    
-#     # Check if any products are missing
-#     missing_products = set(product_ids) - existing_product_ids
-#     if missing_products:
-#         raise HTTPException(
-#             status_code=400, 
-#             detail=f"Products with IDs {missing_products} do not exist"
-#         )
-    
-#     # Create new order
-#     new_order = Order(
-#         order_id=order_id,
-#         clerkId=order_data.clerkId,
-#         total_price=order_data.total_price,
-#         status="placed"
-#     )
-#     db.add(new_order)
-#     await db.flush()  # Get new_order.id for OrderItems
-
-#     # Process each product in the order
-#     for item in order_data.products:
-#         user_cust_value = None
-
-#         # Handle user customization based on type
-#         if item.user_customization_type in ["image", "logo"]:
-#             if item.user_customization_value:
-#                 # Upload base64 image to S3
-#                 s3_url = await upload_base64_image_to_s3(
-#                     item.user_customization_value, 
-#                     file_extension=item.image_extension,
-#                     folder="orders"
-#                 )
-#                 user_cust_value = s3_url
-#             else:
-#                 raise HTTPException(status_code=400, detail="Missing base64 image data for product.")
-        
-#         elif item.user_customization_type == "text":
-#             user_cust_value = item.user_customization_value
+    # Price the order on the server; this also rejects missing and discontinued products
+    quote = await quote_cart(
+        db,
+        [(item.product_id, item.quantity) for item in order_data.products],
+        coupon_code=order_data.coupon_code
+    )
+    if quote["coupon_message"]:
+        raise HTTPException(status_code=400, detail=quote["coupon_message"])
 
-#         # Create order item
-#         order_item = OrderItem(
-#             order_id=new_order.id,
-#             product_id=item.product_id,
-#             quantity=item.quantity,
-#             selected_customizations=item.selected_customizations,
-#             user_customization_type=item.user_customization_type,
-#             user_customization_value=user_cust_value,
-#             individual_price=item.individual_price
-#         )
-#         db.add(order_item)
+    new_order = Order(
+        order_id=await allocate_order_id(db),
+        clerkId=order_data.clerkId,
+        total_price=quote["total"],
+        status="placed"
+    )
+    db.add(new_order)
+    await db.flush()  # Get new_order.id for OrderItems
 
-#     await db.commit()
-#     await db.refresh(new_order)
+    # Image customizations are stored once the worker has uploaded them
+    result = await db.execute(
+        insert(OrderItem).returning(OrderItem.id, sort_by_parameter_order=True),
+        [
+            {
+                "order_id": new_order.id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "selected_customizations": item.selected_customizations,
+                "user_customization_type": item.user_customization_type.value,
+                "user_customization_value": (
+                    item.user_customization_value if item.user_customization_type == "text" else None
+                ),
+                "individual_price": line["unit_price"],
+            }
+            for item, line in zip(order_data.products, quote["lines"])
+        ]
+    )
+    for item, order_item_id in zip(order_data.products, result.scalars().all()):
+        if item.user_customization_type in ["image", "logo"]:
+            enqueue_event(db, "order.customization_image", {
+                "order_id": new_order.order_id,
+                "order_item_id": order_item_id,
+                "image": item.user_customization_value,
+                "extension": item.image_extension,
+            })
+    email_payload = {"order_id": new_order.order_id, "total_price": quote["total"], "clerk_id": order_data.clerkId}
+    enqueue_event(db, "order.owner_email", email_payload)
+    enqueue_event(db, "order.customer_email", email_payload)
+    await db.commit()
 
-#     # Send email to the owner
-#     await send_owner_email(new_order.order_id, order_data.total_price, order_data.clerkId, db)
+    return {"message": "Order placed successfully", "order_id": new_order.order_id, "total_price": quote["total"]}
 
-#     # Send email to the customer
-#     await send_customer_email(new_order.order_id, order_data.clerkId, order_data.total_price, db)
 
-#     return {"message": "Order placed successfully", "order_id": new_order.order_id}
+# Public: Price a cart (bulk-price tiers and coupon) without placing an order.
+@orders_router.post("/cart/quote", response_model=CartQuoteResponse)
+async def quote_cart_prices(quote_request: CartQuoteRequest, db: AsyncSession = Depends(get_read_db)):
+    if not quote_request.items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    return await quote_cart(
+        db,
+        [(item.product_id, item.quantity) for item in quote_request.items],
+        coupon_code=quote_request.coupon_code
+    )
 
-@orders_router.get("/user/{clerkId}", response_model=List[OrderResponse])
+# Pass `cursor` (empty for the first page) to use keyset pagination over (created_at, id)
+# instead of offset; the response is then {"orders", "next_cursor"} instead of a plain list.
+@orders_router.get("/user/{clerkId}", response_model=Union[OrderListResponse, List[OrderResponse]])
 async def get_orders_by_user(
     clerkId: str,
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     sort: str = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    sort_order = asc(Order.created_at) if sort == "asc" else desc(Order.created_at)
-
-    result = await db.execute(
+    query = (
         select(Order)
         .options(selectinload(Order.items)) 
         .where(Order.clerkId == clerkId)
+    )
+
+    if cursor is not None:
+        order_columns = [Order.created_at, Order.id]
+        query = apply_cursor(query, order_columns, cursor, descending=(sort == "desc")).limit(limit + 1)
+        result = await db.execute(query)
+        orders, next_cursor = paginate_rows(result.scalars().all(), limit, order_columns)
+        return {"orders": orders, "next_cursor": next_cursor}
+
+    sort_order = asc(Order.created_at) if sort == "asc" else desc(Order.created_at)
+    result = await db.execute(
+        query
         .order_by(sort_order)
         .offset(offset)
         .limit(limit)
@@ -192,25 +198,39 @@ async def get_order_by_id(
 
     return response
 
+# Pass `cursor` (empty for the first page) to use keyset pagination over (created_at, id);
+# deep pages then cost the same as the first one. The total is optional in cursor mode.
 @orders_router.get("/admin/orders", response_model=OrderListResponse)
 async def get_all_orders(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     sort: str = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     db: AsyncSession = Depends(get_db)
 ):
-    sort_order = asc(Order.created_at) if sort == "asc" else desc(Order.created_at)
+    total = None
+    if cursor is None or include_total:
+        total_result = await db.execute(select(func.count(Order.id)))
+        total = total_result.scalar()
+
+    query = select(Order).options(
+        selectinload(Order.items),   
+        selectinload(Order.receipt) 
+    )
+
+    if cursor is not None:
+        order_columns = [Order.created_at, Order.id]
+        query = apply_cursor(query, order_columns, cursor, descending=(sort == "desc")).limit(limit + 1)
+        result = await db.execute(query)
+        orders, next_cursor = paginate_rows(result.scalars().all(), limit, order_columns)
+        return {"total": total, "orders": orders, "next_cursor": next_cursor}
 
-    total_result = await db.execute(select(func.count(Order.id)))
-    total = total_result.scalar()
+    sort_order = asc(Order.created_at) if sort == "asc" else desc(Order.created_at)
 
     # Get paginated orders
     result = await db.execute(
-        select(Order)
-        .options(
-            selectinload(Order.items),   
-            selectinload(Order.receipt) 
-        )
+        query
         .order_by(sort_order)
         .offset(offset)
         .limit(limit)
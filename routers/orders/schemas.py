@@ -26,7 +26,7 @@ class OrderItemWithBase64(BaseModel):
     user_customization_type: UserCustomizationEnum
     user_customization_value: Optional[str] = None  # Text or base64 image
     image_extension: Optional[str] = "jpg"  # Only used for image/logo types
-    individual_price: int
+    individual_price: Optional[int] = None  # Ignored: prices are computed on the server
 
 
 class OrderCreate(BaseModel):
@@ -38,7 +38,36 @@ class OrderCreate(BaseModel):
 class OrderCreateJSON(BaseModel):
     clerkId: str
     products: List[OrderItemWithBase64]
-    total_price: int
+    total_price: Optional[int] = None  # Ignored: the total is computed on the server
+    coupon_code: Optional[str] = None
+
+
+# Cart quote schemas
+class CartQuoteItem(BaseModel):
+    product_id: str
+    quantity: int
+
+
+class CartQuoteRequest(BaseModel):
+    items: List[CartQuoteItem]
+    coupon_code: Optional[str] = None
+
+
+class CartQuoteLine(BaseModel):
+    product_id: str
+    quantity: int
+    unit_price: int  # Bulk-price tier for this quantity, or the base price
+    line_total: int  # unit_price * quantity, before discount
+    discount: int
+
+
+class CartQuoteResponse(BaseModel):
+    lines: List[CartQuoteLine]
+    subtotal: int
+    discount: int
+    total: int
+    coupon_code: Optional[str] = None  # Set when the coupon was applied
+    coupon_message: Optional[str] = None  # Why the coupon was not applied
 
 
 # ✅ Response schemas
@@ -82,5 +111,6 @@ class OrderDetailsResponse(OrderResponse):
 
 # For orders
 class OrderListResponse(BaseModel):
-    total: int
-    orders: List[OrderResponse]
\ No newline at end of file
+    total: Optional[int] = None  # Omitted in cursor mode unless include_total is set
+    orders: List[OrderResponse]
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 from models import Category
 from routers.products.schemas import CategoryCreate, CategoryResponse, CategoryUpdate, CategoryListResponse
 from sqlalchemy import func
-from config import get_db 
+from config import get_db, get_read_db
 from utils.aws import upload_base64_image_to_s3
+from utils.cache import get_cache, make_cache_key, to_cacheable, conditional_response
+from utils.suggest import suggest_index
 
 categories_router = APIRouter()
 
@@ -29,11 +31,18 @@ async def create_category(category: CategoryCreate, db: AsyncSession = Depends(g
     )
     db.add(new_category)
     await db.commit()
+    await get_cache().invalidate_tags("categories")
+    suggest_index.upsert("category", new_category.id, new_category.name)
     await db.refresh(new_category)
     return new_category
 
 @categories_router.get("/categories", response_model=CategoryListResponse)
-async def get_categories(db: AsyncSession = Depends(get_db)):
+async def get_categories(request: Request, db: AsyncSession = Depends(get_read_db)):
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
     # Get total count
     total_result = await db.execute(select(func.count(Category.id)))
     total = total_result.scalar()
@@ -42,7 +51,9 @@ async def get_categories(db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Category))
     categories = result.scalars().all()
     
-    return {"total": total, "categories": categories}
+    entry = to_cacheable(CategoryListResponse, {"total": total, "categories": categories})
+    await get_cache().set(cache_key, entry, tags=("categories",))
+    return conditional_response(request, entry)
 
 # Admin-only: Update an existing category.
 @categories_router.put("/admin/categories/{category_id}", response_model=CategoryResponse)
@@ -71,6 +82,8 @@ async def update_category(category_id: int, category_update: CategoryUpdate, db:
         setattr(category, key, value)
     
     await db.commit()
+    await get_cache().invalidate_tags("categories")
+    suggest_index.upsert("category", category.id, category.name)
     await db.refresh(category)
     return category
 
@@ -1,12 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+import binascii
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, File, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List, Optional
-from models import Product, Category, ProductStatus, ProductReview
-from routers.products.schemas import ProductCreateForm, ProductResponse, ProductStatusEnum, ProductUpdate, ProductCreateJSON, ProductListResponse, ProductImageBase64
+from models import Product, Category, ProductStatus
+from routers.products.schemas import ProductCreateForm, ProductResponse, ProductStatusEnum, ProductUpdate, ProductCreateJSON, ProductListResponse, ProductImageBase64, SuggestionListResponse, ProductBulkImportResponse
 from sqlalchemy import func
-from config import get_db
-from utils.aws import upload_image_to_s3, upload_base64_image_to_s3
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from pydantic import ValidationError
+from config import get_db, get_read_db, open_read_session
+from utils.aws import check_base64_size, upload_objects_to_s3
+from utils.images import decode_base64_image, prepare_image_upload
+from utils.cache import get_cache, make_cache_key, to_cacheable, conditional_response
+from utils.pagination import apply_cursor, paginate_rows
+from utils.product_id import PRODUCT_ID_ATTEMPTS, allocate_product_ids
+from utils.product_validation import validate_product_fields
+from utils.bulk_import import BULK_IMPORT_BATCH_SIZE, detect_import_format, iter_import_records
+from utils.catalog_export import stream_catalog
+from utils.search import apply_product_search
+from utils.suggest import suggest_index, ensure_suggest_index
 from sqlalchemy.orm import selectinload
 
 products_router = APIRouter()
@@ -23,100 +37,305 @@ async def create_product_json(
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    # ✅ Validate customization options against category.allowed_customizations
-    if product.customization_options:
-        if category.allowed_customizations:
-            allowed_keys = set(category.allowed_customizations.keys())
-            provided_keys = set(product.customization_options.keys())
-            if not provided_keys.issubset(allowed_keys):
-                invalid_keys = provided_keys - allowed_keys
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Customization option keys {invalid_keys} are not allowed for category {category.name}"
-                )
-            for key in provided_keys:
-                allowed_values = set(category.allowed_customizations.get(key, {}).keys())
-                provided_values = set(product.customization_options.get(key, {}).keys())
-                if not provided_values.issubset(allowed_values):
-                    invalid_values = provided_values - allowed_values
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Values {invalid_values} for customization '{key}' are not allowed for category {category.name}"
-                    )
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Category {category.name} does not allow customization options."
-            )
-
-    # ✅ Validate bulk_prices if provided - using Pydantic validation
-    # No need for explicit validation as Pydantic handles it now through the BulkPriceItem model
-    if product.bulk_prices:
-        for bulk_price in product.bulk_prices:
-            if bulk_price.min_quantity <= 0:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Minimum quantity must be positive (got {bulk_price.min_quantity})"
-                )
-            if bulk_price.max_quantity is not None and bulk_price.max_quantity <= bulk_price.min_quantity:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Maximum quantity ({bulk_price.max_quantity}) must be greater than minimum quantity ({bulk_price.min_quantity})"
-                )
-            if bulk_price.price < 0:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Price must be non-negative (got {bulk_price.price})"
-                )
+    # ✅ Validate customization options against category.allowed_customizations, and bulk_prices
+    validate_product_fields(product, category)
 
     # ✅ Use provided product_id or generate a unique one if not provided
-    new_product_id = None
     if product.product_id:
-        # Use admin-provided product_id
-        new_product_id = product.product_id
-        
         # Check if product_id already exists
-        result = await db.execute(select(Product).filter(Product.product_id == new_product_id))
+        result = await db.execute(select(Product).filter(Product.product_id == product.product_id))
         existing_product = result.scalars().first()
         if existing_product:
             raise HTTPException(
                 status_code=400,
-                detail=f"Product ID '{new_product_id}' already exists. Please use a unique ID."
+                detail=f"Product ID '{product.product_id}' already exists. Please use a unique ID."
             )
-    else:
-        # Generate unique product ID if not provided
-        abbreviation = category.name.upper()[:3]
-        result = await db.execute(select(Product).filter(Product.category_id == product.category_id))
-        count = len(result.scalars().all())
-        new_product_id = f"PRNTDT{abbreviation}{count + 1:03d}"
 
     # ✅ Process dimensions if provided
     dimensions_dict = None
     if product.dimensions:
         dimensions_dict = product.dimensions.dict()
 
-    # ✅ Create new product instance (set image URLs as empty)
-    new_product = Product(
-        product_id=new_product_id,
-        main_image_url="",  # Initially empty; will be updated in the next route.
-        side_images_url=[],  # Initially empty.
-        name=product.name,
-        price=product.price,
-        category_id=product.category_id,
-        description=product.description,
-        customization_options=product.customization_options,
-        bulk_prices=[bp.dict() for bp in product.bulk_prices] if product.bulk_prices else None,
-        dimensions=dimensions_dict,
-        weight=product.weight,
-        material=product.material,
-        status=ProductStatus(product.status.value)
-    )
+    # Generated IDs come from the per-category counter; retry with the next number if one
+    # collides with an existing product. The insert runs in a savepoint so a collision only
+    # undoes the insert, not the counter update.
+    for attempt in range(PRODUCT_ID_ATTEMPTS):
+        if product.product_id:
+            new_product_id = product.product_id
+        else:
+            (new_product_id,) = await allocate_product_ids(db, category)
+
+        # ✅ Create new product instance (set image URLs as empty)
+        new_product = Product(
+            product_id=new_product_id,
+            main_image_url="",  # Initially empty; will be updated in the next route.
+            side_images_url=[],  # Initially empty.
+            name=product.name,
+            price=product.price,
+            category_id=product.category_id,
+            description=product.description,
+            customization_options=product.customization_options,
+            bulk_prices=[bp.dict() for bp in product.bulk_prices] if product.bulk_prices else None,
+            dimensions=dimensions_dict,
+            weight=product.weight,
+            material=product.material,
+            status=ProductStatus(product.status.value)
+        )
+        try:
+            async with db.begin_nested():
+                db.add(new_product)
+            break
+        except IntegrityError:
+            if product.product_id or attempt == PRODUCT_ID_ATTEMPTS - 1:
+                await db.rollback()
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Product ID '{new_product_id}' already exists. Please use a unique ID."
+                )
 
-    db.add(new_product)
     await db.commit()
+    await get_cache().invalidate_tags("products")
+    suggest_index.upsert("product", new_product.product_id, new_product.name)
     await db.refresh(new_product)
     return new_product
 
+def _format_validation_error(error: ValidationError):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+
+def _prepare_import_row(record, categories_by_id, categories_by_name):
+    """Validate one import record and return (column values, category). Raises ValueError."""
+    # Rows may name the category instead of giving its id
+    if "category_id" not in record and "category" in record:
+        category = categories_by_name.get(str(record.pop("category")).strip().lower())
+        if category is None:
+            raise ValueError("Category not found")
+        record["category_id"] = category.id
+    try:
+        product = ProductCreateJSON.parse_obj(record)
+    except ValidationError as e:
+        raise ValueError(_format_validation_error(e))
+
+    category = categories_by_id.get(product.category_id)
+    if category is None:
+        raise ValueError("Category not found")
+    try:
+        validate_product_fields(product, category)
+    except HTTPException as e:
+        raise ValueError(e.detail)
+
+    values = {
+        "product_id": product.product_id,
+        "main_image_url": "",
+        "side_images_url": [],
+        "name": product.name,
+        "price": product.price,
+        "category_id": product.category_id,
+        "description": product.description,
+        "customization_options": product.customization_options,
+        "bulk_prices": [bp.dict() for bp in product.bulk_prices] if product.bulk_prices else None,
+        "dimensions": product.dimensions.dict() if product.dimensions else None,
+        "weight": product.weight,
+        "material": product.material,
+        "status": ProductStatus(product.status.value),
+    }
+    return values, category
+
+
+async def _insert_import_batch(db: AsyncSession, batch, dry_run: bool):
+    """
+    Insert one batch of prepared rows with INSERT ... ON CONFLICT DO NOTHING and commit it.
+
+    Rows with an explicit product_id that already exists are reported as errors; rows with a
+    generated product_id that collides get a fresh number. Returns (count, inserted, errors).
+    """
+    errors = []
+    if dry_run:
+        explicit_ids = [values["product_id"] for _, values, _ in batch if values["product_id"]]
+        existing = set()
+        if explicit_ids:
+            result = await db.execute(select(Product.product_id).filter(Product.product_id.in_(explicit_ids)))
+            existing = set(result.scalars().all())
+        for line, values, _ in batch:
+            if values["product_id"] in existing:
+                errors.append({"line": line, "product_id": values["product_id"], "error": "Product ID already exists"})
+        return len(batch) - len(errors), [], errors
+
+    # (line, values, category, generated)
+    pending = [(line, values, category, not values["product_id"]) for line, values, category in batch]
+    inserted = []
+    for attempt in range(PRODUCT_ID_ATTEMPTS):
+        # Reserve the generated IDs with one counter update per category
+        to_generate = {}
+        for _, values, category, generated in pending:
+            if generated:
+                to_generate.setdefault(category.id, (category, []))[1].append(values)
+        for category, rows in to_generate.values():
+            for values, product_id in zip(rows, await allocate_product_ids(db, category, len(rows))):
+                values["product_id"] = product_id
+
+        result = await db.execute(
+            pg_insert(Product)
+            .values([values for _, values, _, _ in pending])
+            .on_conflict_do_nothing(index_elements=[Product.product_id])
+            .returning(Product.product_id)
+        )
+        inserted_ids = set(result.scalars().all())
+
+        retry = []
+        for line, values, category, generated in pending:
+            if values["product_id"] in inserted_ids:
+                inserted.append((values["product_id"], values["name"]))
+            elif generated and attempt < PRODUCT_ID_ATTEMPTS - 1:
+                retry.append((line, values, category, generated))
+            else:
+                errors.append({"line": line, "product_id": values["product_id"], "error": "Product ID already exists"})
+        if not retry:
+            break
+        pending = retry
+
+    await db.commit()
+    return len(inserted), inserted, errors
+
+
+# Admin-only: Create many products from a streamed CSV or JSONL body.
+# Rows use the POST /admin/products fields (a CSV may give `category` by name instead of
+# `category_id`, with nested fields as JSON text). Rows are validated up front and inserted
+# in committed batches; invalid rows are skipped and listed in `errors` by line number.
+# With dry_run=true nothing is written.
+@products_router.post("/admin/products/bulk", response_model=ProductBulkImportResponse)
+async def bulk_import_products(
+    request: Request,
+    import_format: Optional[str] = Query(None, alias="format", pattern="^(csv|jsonl)$"),
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    import_format = import_format or detect_import_format(request.headers.get("content-type"))
+    if import_format is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Send Content-Type text/csv or application/x-ndjson, or pass format=csv|jsonl"
+        )
+
+    # Load categories once for the whole import
+    result = await db.execute(select(Category))
+    categories_by_id = {category.id: category for category in result.scalars().all()}
+    categories_by_name = {category.name.lower(): category for category in categories_by_id.values()}
+
+    total_rows = 0
+    inserted_count = 0
+    inserted = []
+    errors = []
+    seen_ids = set()
+    batch = []
+    async for line, record, error in iter_import_records(request.stream(), import_format):
+        total_rows += 1
+        if error is None:
+            try:
+                values, category = _prepare_import_row(record, categories_by_id, categories_by_name)
+                if values["product_id"] in seen_ids:
+                    raise ValueError("Duplicate product ID in this import")
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            product_id = record.get("product_id") if record else None
+            errors.append({"line": line, "product_id": str(product_id) if product_id is not None else None, "error": error})
+            continue
+        if values["product_id"]:
+            seen_ids.add(values["product_id"])
+        batch.append((line, values, category))
+
+        if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+            count, batch_inserted, batch_errors = await _insert_import_batch(db, batch, dry_run)
+            inserted_count += count
+            inserted += batch_inserted
+            errors += batch_errors
+            batch = []
+    if batch:
+        count, batch_inserted, batch_errors = await _insert_import_batch(db, batch, dry_run)
+        inserted_count += count
+        inserted += batch_inserted
+        errors += batch_errors
+
+    if inserted:
+        await get_cache().invalidate_tags("products")
+        for product_id, name in inserted:
+            suggest_index.upsert("product", product_id, name)
+
+    errors.sort(key=lambda e: e["line"])
+    return {
+        "dry_run": dry_run,
+        "total_rows": total_rows,
+        "inserted": inserted_count,
+        "product_ids": [product_id for product_id, _ in inserted],
+        "errors": errors,
+    }
+
+# Admin-only: Stream the whole catalog as NDJSON (default) or CSV.
+# Reads from a server-side cursor on its own session, since a dependency session is
+# closed before a StreamingResponse body is sent.
+@products_router.get("/admin/products/export")
+async def export_products(export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")):
+    session = await open_read_session()
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_catalog(session, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{export_format}"'},
+    )
+
+async def _upload_product_images(images: ProductImageBase64):
+    """
+    Upload the main and side images of a request as responsive variants.
+
+    Images are decoded and resized one at a time to bound memory, then every missing object
+    is uploaded in parallel; images already stored (same content hash) are not uploaded again.
+    Images Pillow cannot decode (e.g. SVG) are stored as-is. Returns (main_image, side_images)
+    where each image is a (url, variants) pair and either part is None if it was not provided.
+    If an upload fails the product is left unchanged.
+    """
+    uploads = []
+    if images.main_image:
+        uploads.append((images.main_image, images.main_image_extension))
+    if images.side_images:
+        # Make sure we have an extension for each side image
+        extensions = list(images.side_images_extensions or [])
+        extensions.extend(['jpg'] * (len(images.side_images) - len(extensions)))
+        uploads.extend(zip(images.side_images, extensions))
+    if not uploads:
+        return None, None
+
+    objects = []
+    prepared = []
+    for base64_image, file_extension in uploads:
+        check_base64_size(base64_image)
+        try:
+            content = decode_base64_image(base64_image)
+        except binascii.Error:
+            raise HTTPException(status_code=400, detail="Invalid base64 image")
+        if not content:
+            raise HTTPException(status_code=400, detail="Decoded base64 image is empty.")
+        image_objects, url, variants = await prepare_image_upload(content, file_extension)
+        objects.extend(image_objects)
+        prepared.append((url, variants))
+    await upload_objects_to_s3(objects)
+
+    main_image = prepared.pop(0) if images.main_image else None
+    return main_image, (prepared if images.side_images else None)
+
+
+def _apply_product_images(product: Product, main_image, side_images):
+    """Store uploaded images and their variants on a product."""
+    image_variants = dict(product.image_variants or {})
+    if main_image:
+        product.main_image_url, image_variants["main"] = main_image
+    if side_images:
+        product.side_images_url = [url for url, _ in side_images]
+        image_variants["side"] = [variants for _, variants in side_images]
+    product.image_variants = image_variants
+
 # Admin-only: Upload product images using base64 encoded images
 # Supports multiple image formats: jpg, jpeg, png, gif, webp, etc.
 @products_router.post("/admin/products/{product_id}/images", response_model=ProductResponse)
@@ -131,74 +350,74 @@ async def upload_product_images(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # ✅ Upload main image if provided
-    if images.main_image:
-        main_image_url = await upload_base64_image_to_s3(
-            images.main_image, 
-            file_extension=images.main_image_extension
-        )
-        product.main_image_url = main_image_url
-
-    # ✅ Upload side images if provided
-    if images.side_images:
-        # Make sure we have extensions for each side image
-        extensions = images.side_images_extensions or ['jpg'] * len(images.side_images)
-        
-        # Make sure we have enough extensions
-        if len(extensions) < len(images.side_images):
-            extensions.extend(['jpg'] * (len(images.side_images) - len(extensions)))
-            
-        # Upload each side image
-        side_images_urls = []
-        for i, img in enumerate(images.side_images):
-            url = await upload_base64_image_to_s3(img, file_extension=extensions[i])
-            side_images_urls.append(url)
-            
-        product.side_images_url = side_images_urls
+    # ✅ Upload main and side images (if provided) as resized variants, in parallel
+    main_image, side_images = await _upload_product_images(images)
+    _apply_product_images(product, main_image, side_images)
 
     await db.commit()
+    await get_cache().invalidate_tags("products")
     await db.refresh(product)
     return product
 
 
+# Sort options for /products/filter: sort_by -> (column, descending)
+PRODUCT_SORT_OPTIONS = {
+    "price_asc": (Product.price, False),
+    "price_desc": (Product.price, True),
+    "rating_asc": (Product.average_rating, False),
+    "rating_desc": (Product.average_rating, True),
+    "name_asc": (Product.name, False),
+    "name_desc": (Product.name, True),
+}
+
 # Public: Retrieve all products.
+# Pass `cursor` (empty for the first page) to use keyset pagination instead of skip/limit;
+# with a cursor the total count is only computed when include_total is true.
 @products_router.get("/products", response_model=ProductListResponse)
-async def get_products(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    # Get total count
-    total_result = await db.execute(select(func.count(Product.id)))
-    total = total_result.scalar()
-    
-    # Handle edge cases for pagination
-    if total == 0:
-        return {"total": 0, "products": []}
+async def get_products(
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: AsyncSession = Depends(get_read_db)
+):
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
+    total = None
+    if cursor is None or include_total:
+        # Get total count
+        total_result = await db.execute(select(func.count(Product.id)))
+        total = total_result.scalar()
+        
+        # Handle edge cases for pagination
+        if total == 0:
+            return {"total": 0, "products": []}
     
-    # Ensure skip is not greater than total
-    if skip >= total:
-        skip = max(0, total - (total % limit or limit))  # Adjust to last page
+    query = select(Product).options(selectinload(Product.category))
+    order_columns = [Product.created_at, Product.id]
+    if cursor is not None:
+        query = apply_cursor(query, order_columns, cursor).limit(limit + 1)
+    else:
+        # Ensure skip is not greater than total
+        if skip >= total:
+            skip = max(0, total - (total % limit or limit))  # Adjust to last page
+        query = query.offset(skip).limit(limit)
     
     # Get paginated products with proper error handling
     try:
-        query = select(Product).options(selectinload(Product.category)).offset(skip).limit(limit)
         result = await db.execute(query)
         products = result.scalars().all()
-        
-        # Get review counts for each product
-        product_ids = [product.product_id for product in products]
-        review_counts = {}
-        
-        # Count reviews for each product
-        if product_ids:
-            review_count_query = select(ProductReview.product_id, func.count(ProductReview.id).label('count'))\
-                .where(ProductReview.product_id.in_(product_ids))\
-                .group_by(ProductReview.product_id)
-            review_result = await db.execute(review_count_query)
-            review_counts = {product_id: count for product_id, count in review_result}
-        
-        # Add review count to each product
-        for product in products:
-            product.review_count = review_counts.get(product.product_id, 0)
+        next_cursor = None
+        if cursor is not None:
+            products, next_cursor = paginate_rows(products, limit, order_columns)
             
-        return {"total": total, "products": products}
+        entry = to_cacheable(ProductListResponse, {"total": total, "products": products, "next_cursor": next_cursor})
+        await get_cache().set(cache_key, entry, tags=("products", "categories"))
+        return conditional_response(request, entry)
     except Exception as e:
         # Log the error and return a safe response
         print(f"Error fetching products: {str(e)}")
@@ -206,16 +425,24 @@ async def get_products(skip: int = 0, limit: int = 10, db: AsyncSession = Depend
 
 @products_router.get("/products/filter", response_model=ProductListResponse)
 async def filter_products(
+    request: Request,
     category_id: Optional[int] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     min_rating: Optional[float] = None,
-    search: Optional[str] = None,  # New parameter for searching by product name
-    sort_by: Optional[str] = None,
+    search: Optional[str] = None,  # Full-text search over name, category, material and description
+    sort_by: Optional[str] = None,  # One of PRODUCT_SORT_OPTIONS or "relevance" (default when searching)
     skip: int = 0,
     limit: int = 10,
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None,  # Keyset pagination over the active sort key, see get_products
+    include_total: bool = True,
+    db: AsyncSession = Depends(get_read_db)
 ):
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
     # Build base query
     query = select(Product).options(selectinload(Product.category))
     
@@ -228,71 +455,80 @@ async def filter_products(
         query = query.filter(Product.price <= max_price)
     if min_rating is not None:
         query = query.filter(Product.average_rating >= min_rating)
-    # Add search by product name filter
+    # Add full-text search filter (prefix and typo tolerant)
+    rank = None
     if search is not None and search.strip():
-        search_term = f"%{search.strip()}%"  # Add wildcards for partial matching
-        query = query.filter(Product.name.ilike(search_term))
-    
-    # Get total count with filters applied
-    total_result = await db.execute(select(func.count()).select_from(query.subquery()))
-    total = total_result.scalar()
+        query, rank = apply_product_search(query, search)
+        if sort_by is None and cursor is None:
+            sort_by = "relevance"
+    if sort_by == "relevance" and rank is None:
+        raise HTTPException(status_code=400, detail="sort_by=relevance requires a search term")
+    if sort_by == "relevance" and cursor is not None:
+        raise HTTPException(status_code=400, detail="sort_by=relevance does not support cursor pagination, use skip/limit")
     
-    # Handle edge cases for pagination
-    if total == 0:
-        return {"total": 0, "products": []}
-    
-    # Ensure skip is not greater than total
-    if skip >= total:
-        skip = max(0, total - (total % limit or limit))  # Adjust to last page
+    total = None
+    if cursor is None or include_total:
+        # Get total count with filters applied
+        total_result = await db.execute(select(func.count()).select_from(query.subquery()))
+        total = total_result.scalar()
+        
+        # Handle edge cases for pagination
+        if total == 0:
+            return {"total": 0, "products": []}
     
-    # Apply sorting
-    if sort_by:
-        if sort_by == "price_asc":
-            query = query.order_by(Product.price.asc())
-        elif sort_by == "price_desc":
-            query = query.order_by(Product.price.desc())
-        elif sort_by == "rating_asc":
-            query = query.order_by(Product.average_rating.asc())
-        elif sort_by == "rating_desc":
-            query = query.order_by(Product.average_rating.desc())
-        # Add name-based sorting options
-        elif sort_by == "name_asc":
-            query = query.order_by(Product.name.asc())
-        elif sort_by == "name_desc":
-            query = query.order_by(Product.name.desc())
+    # Apply sorting and pagination
+    if cursor is not None:
+        sort_column, descending = PRODUCT_SORT_OPTIONS.get(sort_by, (Product.created_at, False))
+        order_columns = [sort_column, Product.id]
+        query = apply_cursor(query, order_columns, cursor, descending=descending).limit(limit + 1)
+    else:
+        if sort_by == "relevance":
+            query = query.order_by(rank.desc(), Product.id)
+        elif sort_by in PRODUCT_SORT_OPTIONS:
+            sort_column, descending = PRODUCT_SORT_OPTIONS[sort_by]
+            query = query.order_by(sort_column.desc() if descending else sort_column.asc())
+        
+        # Ensure skip is not greater than total
+        if skip >= total:
+            skip = max(0, total - (total % limit or limit))  # Adjust to last page
+        query = query.offset(skip).limit(limit)
     
-    # Apply pagination and handle errors
+    # Fetch the page and handle errors
     try:
-        query = query.offset(skip).limit(limit)
         result = await db.execute(query)
         products = result.scalars().all()
-        
-        # Get review counts for each product
-        product_ids = [product.product_id for product in products]
-        review_counts = {}
-        
-        # Count reviews for each product
-        if product_ids:
-            review_count_query = select(ProductReview.product_id, func.count(ProductReview.id).label('count'))\
-                .where(ProductReview.product_id.in_(product_ids))\
-                .group_by(ProductReview.product_id)
-            review_result = await db.execute(review_count_query)
-            review_counts = {product_id: count for product_id, count in review_result}
-        
-        # Add review count to each product
-        for product in products:
-            product.review_count = review_counts.get(product.product_id, 0)
+        next_cursor = None
+        if cursor is not None:
+            products, next_cursor = paginate_rows(products, limit, order_columns)
             
-        return {"total": total, "products": products}
+        entry = to_cacheable(ProductListResponse, {"total": total, "products": products, "next_cursor": next_cursor})
+        await get_cache().set(cache_key, entry, tags=("products", "categories"))
+        return conditional_response(request, entry)
     except Exception as e:
         # Log the error and return a safe response
         print(f"Error fetching filtered products: {str(e)}")
         return {"total": total, "products": [], "error": "An error occurred while fetching products"}
 
 
+# Public: Typeahead suggestions for product names, categories and shop-by-need tags.
+# Served from an in-memory prefix index; a session is only opened when the index is (re)built.
+@products_router.get("/products/suggest", response_model=SuggestionListResponse)
+async def suggest_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20)
+):
+    index = await ensure_suggest_index()
+    return {"suggestions": index.search(q, limit)}
+
+
 # Public: Retrieve a single product by its custom product_id.
 @products_router.get("/products/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str, db: AsyncSession = Depends(get_db)):
+async def get_product(request: Request, product_id: str, db: AsyncSession = Depends(get_read_db)):
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
     # Add selectinload for the category relationship to ensure category data is loaded
     query = select(Product).options(selectinload(Product.category)).filter(Product.product_id == product_id)
     result = await db.execute(query)
@@ -300,15 +536,9 @@ async def get_product(product_id: str, db: AsyncSession = Depends(get_db)):
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Get the review count for this product
-    review_count_query = select(func.count(ProductReview.id)).filter(ProductReview.product_id == product_id)
-    review_count_result = await db.execute(review_count_query)
-    review_count = review_count_result.scalar() or 0
-    
-    # Set the review count on the product
-    product.review_count = review_count
-    
-    return product
+    entry = to_cacheable(ProductResponse, product)
+    await get_cache().set(cache_key, entry, tags=("products", "categories"))
+    return conditional_response(request, entry)
 
 
 # Admin-only: Update a product.
@@ -382,6 +612,8 @@ async def update_product(
 
     # ✅ Commit changes to DB
     await db.commit()
+    await get_cache().invalidate_tags("products")
+    suggest_index.upsert("product", db_product.product_id, db_product.name)
     await db.refresh(db_product)
     return db_product
 
@@ -398,32 +630,12 @@ async def update_product_image(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # ✅ Update main image if provided
-    if image.main_image:
-        main_image_url = await upload_base64_image_to_s3(
-            image.main_image,
-            file_extension=image.main_image_extension
-        )   
-        product.main_image_url = main_image_url
-
-    # ✅ Update side images if provided
-    if image.side_images:
-        # Make sure we have extensions for each side image
-        extensions = image.side_images_extensions or ['jpg'] * len(image.side_images)   
-        
-        # Make sure we have enough extensions
-        if len(extensions) < len(image.side_images):
-            extensions.extend(['jpg'] * (len(image.side_images) - len(extensions)))
-            
-        # Upload each side image
-        side_images_urls = []
-        for i, img in enumerate(image.side_images):
-            url = await upload_base64_image_to_s3(img, file_extension=extensions[i])
-            side_images_urls.append(url)
-            
-        product.side_images_url = side_images_urls
-        
+    # ✅ Upload main and side images (if provided) as resized variants, in parallel
+    main_image, side_images = await _upload_product_images(image)
+    _apply_product_images(product, main_image, side_images)
+
     await db.commit()
+    await get_cache().invalidate_tags("products")
     await db.refresh(product)
     return product
 
@@ -436,5 +648,7 @@ async def delete_product(product_id: str, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Product not found")
     await db.delete(db_product)
     await db.commit()
+    await get_cache().invalidate_tags("products")
+    suggest_index.remove("product", product_id)
     return
 
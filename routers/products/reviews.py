@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Union
 from models import ProductReview, Product
-from routers.products.schemas import ProductReviewCreate, ProductReviewResponse
+from routers.products.schemas import (
+    ProductReviewCreate, ProductReviewResponse, ProductReviewListResponse, ProductReviewSummaryResponse
+)
 from ..crud import get_user_by_clerkId  
-from config import get_db  
+from config import get_db, get_read_db
+from utils.cache import get_cache, make_cache_key, to_cacheable, conditional_response
+from utils.pagination import apply_cursor, paginate_rows
+from utils.review_stats import MIN_RATING, MAX_RATING, apply_review_rating, recompute_review_stats
 
 reviews_router = APIRouter()
 
@@ -21,6 +27,8 @@ async def create_review(review: ProductReviewCreate, db: AsyncSession = Depends(
     existing_review = result.scalars().first()
     if existing_review:
         raise HTTPException(status_code=400, detail="User has already reviewed this product")
+    if not MIN_RATING <= review.rating <= MAX_RATING:
+        raise HTTPException(status_code=400, detail=f"Rating must be between {MIN_RATING} and {MAX_RATING}")
     
     user = await get_user_by_clerkId(db, review.clerkId)
     if not user:
@@ -34,25 +42,79 @@ async def create_review(review: ProductReviewCreate, db: AsyncSession = Depends(
         review_text=review.review_text
     )
     db.add(new_review)
-    await db.commit()
+    try:
+        # Update the product's rating aggregates in the same transaction as the insert
+        updated = await apply_review_rating(db, review.product_id, review.rating)
+        if not updated:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Product not found")
+        await db.commit()
+    except IntegrityError:
+        # Unknown product, or a concurrent request inserted the same (clerkId, product_id) review first
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User has already reviewed this product or product does not exist")
     await db.refresh(new_review)
-    
-    # Update the product's average rating.
-    result = await db.execute(select(ProductReview).filter(ProductReview.product_id == review.product_id))
-    reviews = result.scalars().all()
-    if reviews:
-        avg_rating = sum(r.rating for r in reviews) / len(reviews)
-        result = await db.execute(select(Product).filter(Product.product_id == review.product_id))
-        product = result.scalars().first()
-        if product:
-            product.average_rating = avg_rating
-            await db.commit()
+    await get_cache().invalidate_tags("products")
     
     return new_review
 
-# Public: Retrieve all reviews for a specific product.
-@reviews_router.get("/reviews/{product_id}", response_model=List[ProductReviewResponse])
-async def get_reviews(product_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(ProductReview).filter(ProductReview.product_id == product_id))
-    reviews = result.scalars().all()
-    return reviews
+REVIEW_SORT_OPTIONS = {
+    "newest": ([ProductReview.created_at, ProductReview.id], True),
+    "highest": ([ProductReview.rating, ProductReview.id], True),
+    "lowest": ([ProductReview.rating, ProductReview.id], False),
+}
+
+# Public: Retrieve one page of reviews for a specific product.
+# Pass `cursor` (empty for the first page) to page through them: the response is then
+# {"reviews", "next_cursor"} instead of a plain list.
+@reviews_router.get("/reviews/{product_id}", response_model=Union[ProductReviewListResponse, List[ProductReviewResponse]])
+async def get_reviews(
+    product_id: str,
+    sort: str = Query("newest", pattern="^(newest|highest|lowest)$"),
+    min_rating: Optional[int] = Query(None, ge=MIN_RATING, le=MAX_RATING),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    query = select(ProductReview).filter(ProductReview.product_id == product_id)
+    if min_rating is not None:
+        query = query.filter(ProductReview.rating >= min_rating)
+
+    order_columns, descending = REVIEW_SORT_OPTIONS[sort]
+    query = apply_cursor(query, order_columns, cursor, descending=descending).limit(limit + 1)
+    result = await db.execute(query)
+    reviews, next_cursor = paginate_rows(result.scalars().all(), limit, order_columns)
+    if cursor is None:
+        return reviews
+    return {"reviews": reviews, "next_cursor": next_cursor}
+
+# Public: Review count, average and per-star histogram of a product, read from its stored aggregates.
+@reviews_router.get("/reviews/{product_id}/summary", response_model=ProductReviewSummaryResponse)
+async def get_review_summary(request: Request, product_id: str, db: AsyncSession = Depends(get_read_db)):
+    cache_key = make_cache_key(request)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+
+    result = await db.execute(select(Product).filter(Product.product_id == product_id))
+    product = result.scalars().first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    entry = to_cacheable(ProductReviewSummaryResponse, {
+        "product_id": product.product_id,
+        "review_count": product.review_count,
+        "average_rating": product.average_rating or 0,
+        "rating_histogram": {
+            str(star): getattr(product, f"rating_{star}_count") for star in range(MIN_RATING, MAX_RATING + 1)
+        },
+    })
+    await get_cache().set(cache_key, entry, tags=("products",))
+    return conditional_response(request, entry)
+
+# Admin-only: Recompute the rating aggregates of every product from the reviews table.
+@reviews_router.post("/admin/reviews/recompute-stats")
+async def repair_review_stats(db: AsyncSession = Depends(get_db)):
+    updated = await recompute_review_stats(db)
+    await get_cache().invalidate_tags("products")
+    return {"message": f"Recomputed review stats for {updated} products"}
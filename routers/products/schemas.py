@@ -3,6 +3,7 @@ from typing import Optional, Dict, List, Union
 from enum import Enum
 from fastapi import Form
 from datetime import datetime
+from utils.images import build_srcset
 
 # Enum for product status in schemas.
 class ProductStatusEnum(str, Enum):
@@ -79,9 +80,13 @@ class ProductResponse(BaseModel):
     customization_options: Optional[Dict[str, Dict[str, str]]] = None  # e.g. {"size": ["S:#size_S", "M:#size_M"], "color": ["RED:#FF0000", "BLUE:#0000FF"]}
     average_rating: float
     review_count: int = 0  # Add review count field
+    rating_histogram: Dict[str, int] = {}  # Review count per star, e.g. {"1": 0, ..., "5": 12}
     status: ProductStatusEnum
     main_image_url: str
     side_images_url: Optional[List[str]] = None
+    # Responsive image sources, {format: "url 160w, url 480w, ..."}; None for images without variants
+    main_image_srcset: Optional[Dict[str, str]] = None
+    side_images_srcset: Optional[List[Optional[Dict[str, str]]]] = None
     category_name: Optional[str] = None  # New field to return the category name
 
     class Config:
@@ -91,7 +96,16 @@ class ProductResponse(BaseModel):
     def set_category_name(cls, values):
         # If values is not a dict, convert it using __dict__
         if not isinstance(values, dict):
-            values = values.__dict__
+            values = dict(values.__dict__)
+        if "main_image_srcset" not in values:
+            image_variants = values.get("image_variants") or {}
+            values["main_image_srcset"] = build_srcset(image_variants.get("main"))
+            if image_variants.get("side"):
+                values["side_images_srcset"] = [build_srcset(variants) for variants in image_variants["side"]]
+        if "rating_histogram" not in values:
+            values["rating_histogram"] = {
+                str(star): values.get(f"rating_{star}_count") or 0 for star in range(1, 6)
+            }
         category = values.get("category")
         if category:
             if isinstance(category, dict):
@@ -156,9 +170,45 @@ class ProductReviewResponse(BaseModel):
         orm_mode = True
 
 
+class ProductReviewListResponse(BaseModel):
+    reviews: List[ProductReviewResponse]
+    next_cursor: Optional[str] = None  # Only set when there is another page
+
+
+class ProductReviewSummaryResponse(BaseModel):
+    product_id: str
+    review_count: int
+    average_rating: float
+    rating_histogram: Dict[str, int]  # Review count per star, "1" through "5"
+
+
+class ProductBulkImportError(BaseModel):
+    line: int  # Line of the import body where the row starts
+    product_id: Optional[str] = None
+    error: str
+
+
+class ProductBulkImportResponse(BaseModel):
+    dry_run: bool
+    total_rows: int
+    inserted: int  # With dry_run, the number of rows that would be inserted
+    product_ids: List[str]  # IDs of the created products (empty with dry_run)
+    errors: List[ProductBulkImportError]
+
+
 class ProductListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None  # Omitted in cursor mode unless include_total is set
     products: List[ProductResponse]
+    next_cursor: Optional[str] = None  # Only set in cursor mode when there is another page
+
+# Schemas for typeahead suggestions
+class Suggestion(BaseModel):
+    text: str
+    type: str  # "product", "category" or "need"
+    ref: str  # product_id, category id or the need itself
+
+class SuggestionListResponse(BaseModel):
+    suggestions: List[Suggestion]
 
 class CategoryListResponse(BaseModel):
     total: int
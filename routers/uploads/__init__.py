@@ -0,0 +1 @@
+# Package init file 
\ No newline at end of file
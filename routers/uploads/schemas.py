@@ -0,0 +1,51 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+from enum import Enum
+
+# Catalog image an admin upload gets attached to
+class UploadTargetEnum(str, Enum):
+    product = "product"
+    category = "category"
+    banner = "banner"
+
+# Which image of a product an upload replaces or adds to
+class ProductImageRoleEnum(str, Enum):
+    main = "main"
+    side = "side"
+
+class PresignedUploadRequest(BaseModel):
+    target: UploadTargetEnum
+    file_extension: str = "jpg"
+
+class PresignedUploadResponse(BaseModel):
+    url: str  # POST the form (fields + a "file" part last) here
+    fields: Dict[str, str]
+    key: str  # Pass back to the matching finalize route
+    expires_in: int  # Seconds
+    max_size: int  # Bytes
+
+class FinalizeUploadRequest(BaseModel):
+    target: UploadTargetEnum
+    target_id: str  # product_id for products, numeric id for the others
+    key: str
+    role: Optional[ProductImageRoleEnum] = ProductImageRoleEnum.main  # Products only
+
+class FinalizeUploadResponse(BaseModel):
+    target: UploadTargetEnum
+    target_id: str
+    url: str
+
+# Customer uploads: the image customization of an item of one of their own orders
+class CustomizationPresignRequest(BaseModel):
+    clerkId: str
+    order_item_id: int
+    file_extension: str = "jpg"
+
+class CustomizationFinalizeRequest(BaseModel):
+    clerkId: str
+    order_item_id: int
+    key: str
+
+class CustomizationFinalizeResponse(BaseModel):
+    order_item_id: int
+    url: str
@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models import Product, Category, Banner, Order, OrderItem
+from routers.uploads.schemas import (
+    UploadTargetEnum, ProductImageRoleEnum, PresignedUploadRequest, PresignedUploadResponse,
+    FinalizeUploadRequest, FinalizeUploadResponse, CustomizationPresignRequest,
+    CustomizationFinalizeRequest, CustomizationFinalizeResponse
+)
+from config import get_db
+from utils.aws import (
+    CONTENT_TYPES, MAX_DIRECT_UPLOAD_BYTES, PRESIGNED_UPLOAD_EXPIRES_SECONDS,
+    create_presigned_upload, head_s3_object, s3_object_url
+)
+from utils.cache import get_cache
+from utils.order import CUSTOMIZATION_IMAGE_FOLDER
+from utils.stored_objects import record_stored_objects
+from starlette.concurrency import run_in_threadpool
+
+uploads_router = APIRouter()
+
+# S3 folder each kind of catalog upload goes to; finalize only accepts keys from the matching folder
+UPLOAD_FOLDERS = {
+    UploadTargetEnum.product: "products",
+    UploadTargetEnum.category: "categories",
+    UploadTargetEnum.banner: "banners",
+}
+
+
+def _parse_int_id(target_id: str):
+    try:
+        return int(target_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="target_id must be numeric for this target")
+
+
+async def _presign(folder: str, file_extension: str):
+    file_extension = file_extension.lower().lstrip(".")
+    if file_extension not in CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported file extension '{file_extension}'")
+
+    presigned = await run_in_threadpool(create_presigned_upload, folder, file_extension)
+    return {
+        **presigned,
+        "expires_in": PRESIGNED_UPLOAD_EXPIRES_SECONDS,
+        "max_size": MAX_DIRECT_UPLOAD_BYTES,
+    }
+
+
+async def _check_uploaded_object(key: str, folder: str):
+    """Validate an object uploaded with a presigned form and return its public URL."""
+    if not key.startswith(folder + "/") or ".." in key:
+        raise HTTPException(status_code=400, detail="Key does not belong to this upload target")
+
+    head = await head_s3_object(key)
+    if head is None:
+        raise HTTPException(status_code=404, detail="Uploaded object not found")
+    if not head.get("ContentType", "").startswith("image/") or head.get("ContentLength", 0) > MAX_DIRECT_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail="Uploaded object is not an accepted image")
+
+    await record_stored_objects([(key, None, head.get("ContentLength"), head.get("ContentType"))])
+    return s3_object_url(key)
+
+
+async def _get_customer_order_item(db: AsyncSession, clerk_id: str, order_item_id: int):
+    """The order item if it belongs to an order of this customer and takes an image, else 404/400."""
+    result = await db.execute(
+        select(OrderItem)
+        .join(Order, OrderItem.order_id == Order.id)
+        .where(OrderItem.id == order_item_id, Order.clerkId == clerk_id)
+    )
+    order_item = result.scalars().first()
+    if not order_item:
+        raise HTTPException(status_code=404, detail="Order item not found")
+    if order_item.user_customization_type not in ("image", "logo"):
+        raise HTTPException(status_code=400, detail="Order item does not take an image customization")
+    return order_item
+
+
+# Admin-only: Step 1 of a catalog image upload. Get a presigned POST form and upload the
+# image straight to S3 with it, so the image bytes never pass through the API.
+@uploads_router.post("/admin/uploads/presign", response_model=PresignedUploadResponse)
+async def presign_upload(upload: PresignedUploadRequest):
+    return await _presign(UPLOAD_FOLDERS[upload.target], upload.file_extension)
+
+
+# Admin-only: Step 2, check the uploaded object and attach its URL to the target.
+@uploads_router.post("/admin/uploads/finalize", response_model=FinalizeUploadResponse)
+async def finalize_upload(upload: FinalizeUploadRequest, db: AsyncSession = Depends(get_db)):
+    url = await _check_uploaded_object(upload.key, UPLOAD_FOLDERS[upload.target])
+
+    if upload.target == UploadTargetEnum.product:
+        result = await db.execute(select(Product).filter(Product.product_id == upload.target_id))
+        product = result.scalars().first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        # Direct uploads are stored as-is, without resized variants
+        image_variants = dict(product.image_variants or {})
+        if upload.role == ProductImageRoleEnum.side:
+            side_variants = list(image_variants.get("side") or [None] * len(product.side_images_url or []))
+            product.side_images_url = (product.side_images_url or []) + [url]
+            image_variants["side"] = side_variants + [None]
+        else:
+            product.main_image_url = url
+            image_variants["main"] = None
+        product.image_variants = image_variants
+        cache_tag = "products"
+
+    elif upload.target == UploadTargetEnum.category:
+        category = await db.get(Category, _parse_int_id(upload.target_id))
+        if not category:
+            raise HTTPException(status_code=404, detail="Category not found")
+        category.image_url = url
+        cache_tag = "categories"
+
+    else:
+        banner = await db.get(Banner, _parse_int_id(upload.target_id))
+        if not banner:
+            raise HTTPException(status_code=404, detail="Banner not found")
+        banner.image_url = url
+        cache_tag = "banners"
+
+    await db.commit()
+    await get_cache().invalidate_tags(cache_tag)
+    return {"target": upload.target, "target_id": upload.target_id, "url": url}
+
+
+# Public: Step 1 of a customer's customization image upload for an item of their own order.
+@uploads_router.post("/uploads/customizations/presign", response_model=PresignedUploadResponse)
+async def presign_customization_upload(upload: CustomizationPresignRequest, db: AsyncSession = Depends(get_db)):
+    await _get_customer_order_item(db, upload.clerkId, upload.order_item_id)
+    return await _presign(CUSTOMIZATION_IMAGE_FOLDER, upload.file_extension)
+
+
+# Public: Step 2, attach the uploaded image to the customer's order item.
+@uploads_router.post("/uploads/customizations/finalize", response_model=CustomizationFinalizeResponse)
+async def finalize_customization_upload(upload: CustomizationFinalizeRequest, db: AsyncSession = Depends(get_db)):
+    order_item = await _get_customer_order_item(db, upload.clerkId, upload.order_item_id)
+    url = await _check_uploaded_object(upload.key, CUSTOMIZATION_IMAGE_FOLDER)
+    order_item.user_customization_value = url
+    await db.commit()
+    return {"order_item_id": order_item.id, "url": url}
@@ -2,52 +2,267 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+import re
+import time
+import base64
+import asyncio
+import hashlib
+import binascii
 import boto3
 from uuid import uuid4
-from botocore.exceptions import NoCredentialsError
+from urllib.parse import unquote, urlparse
+from botocore.exceptions import ClientError, NoCredentialsError
 from io import BytesIO
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
 from starlette.concurrency import run_in_threadpool
 
 AWS_REGION = os.getenv("AWS_REGION")
 AWS_S3_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
 AWS_CLOUDFRONT_URL = os.getenv("AWS_CLOUDFRONT_URL")
+# Point at an S3-compatible stand-in (e.g. MinIO or LocalStack) for local development
+AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL")
+# Maximum number of S3 uploads one request runs at the same time
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+# Presigned direct uploads: how long the upload form is valid and the largest accepted object
+PRESIGNED_UPLOAD_EXPIRES_SECONDS = int(os.getenv("PRESIGNED_UPLOAD_EXPIRES_SECONDS", "900"))
+MAX_DIRECT_UPLOAD_BYTES = int(os.getenv("MAX_DIRECT_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Uploads through the API: largest accepted file, how much is read at a time, and the S3
+# multipart part size (S3 requires at least 5 MB for every part but the last)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+S3_MULTIPART_PART_BYTES = max(int(os.getenv("S3_MULTIPART_PART_BYTES", str(5 * 1024 * 1024))), 5 * 1024 * 1024)
+
+# Map common file extensions to MIME types
+CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+    "bmp": "image/bmp"
+}
 
 s3_client = boto3.client(
     "s3",
     region_name=AWS_REGION,
+    endpoint_url=AWS_S3_ENDPOINT_URL,
 )
 
-async def upload_image_to_s3(file: UploadFile, folder="products") -> str:
+def _s3_base_url():
+    if AWS_CLOUDFRONT_URL:
+        return AWS_CLOUDFRONT_URL
+    if AWS_S3_ENDPOINT_URL:
+        return f"{AWS_S3_ENDPOINT_URL.rstrip('/')}/{AWS_S3_BUCKET_NAME}"
+    return f"https://{AWS_S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com"
+
+def s3_object_url(key: str) -> str:
+    """Public URL of an object: CloudFront if configured, otherwise the bucket itself."""
+    return f"{_s3_base_url()}/{key}"
+
+def upload_too_large():
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+
+
+def check_base64_size(base64_image: str):
+    """Reject a base64 payload whose decoded size would exceed MAX_UPLOAD_BYTES, before decoding it."""
+    if len(base64_image) * 3 // 4 > MAX_UPLOAD_BYTES + 3:
+        raise upload_too_large()
+
+
+async def iter_upload_file(file: UploadFile):
+    """Read an UploadFile in UPLOAD_CHUNK_BYTES chunks."""
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+_BASE64_IGNORED = re.compile(r"\s+")
+
+
+def iter_base64_chunks(base64_image: str):
+    """Decode a (data URL or bare) base64 string slice by slice instead of all at once."""
+    start = base64_image.find("base64,")
+    start = start + len("base64,") if start >= 0 else 0
+    # Slices are a multiple of 4 characters so each one decodes on its own
+    step = UPLOAD_CHUNK_BYTES // 3 * 4
+    pending = ""
+    for offset in range(start, len(base64_image), step):
+        pending += _BASE64_IGNORED.sub("", base64_image[offset:offset + step])
+        usable = len(pending) - len(pending) % 4
+        if usable:
+            yield base64.b64decode(pending[:usable], validate=True)
+            pending = pending[usable:]
+    if pending:
+        raise binascii.Error("Incorrect base64 padding")
+
+
+def validate_base64_image(base64_image: str):
+    """
+    Check a base64 image without keeping it decoded: 413 if it is too large, 400 if it is
+    not valid base64. Lets callers reject it up front when the upload itself happens later.
+    """
+    check_base64_size(base64_image)
     try:
-        file_extension = file.filename.split(".")[-1]
-        unique_filename = f"{folder}/{uuid4().hex}.{file_extension}"
+        for _ in iter_base64_chunks(base64_image):
+            pass
+    except binascii.Error:
+        raise HTTPException(status_code=400, detail="Image data is not valid base64")
 
-        try:
-            file_content = await file.read()  # Async read!
-        except Exception as e:
-            raise Exception(f"Failed to read file content: {str(e)}")
 
-        if not file_content or len(file_content) == 0:
-            raise Exception("Uploaded file is empty.")
+class S3StreamingUpload:
+    """
+    Write an object to S3 chunk by chunk, keeping at most one multipart part in memory.
 
-        file_stream = BytesIO(file_content)
+    Small objects (under S3_MULTIPART_PART_BYTES) are sent with a single PutObject; larger
+    ones become a multipart upload. The size limit is enforced as data arrives and a
+    SHA-256 of the content is computed along the way.
+    """
 
-        await run_in_threadpool(
-            s3_client.upload_fileobj,
-            file_stream,
-            AWS_S3_BUCKET_NAME,
-            unique_filename,
-            ExtraArgs={"ContentType": file.content_type}
-        )
+    def __init__(self, key: str, content_type: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.key = key
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
 
-        url = (
-            f"{AWS_CLOUDFRONT_URL}/{unique_filename}"
-            if AWS_CLOUDFRONT_URL
-            else f"https://{AWS_S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{unique_filename}"
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise upload_too_large()
+        self.sha256.update(data)
+        self._buffer += data
+        if len(self._buffer) >= S3_MULTIPART_PART_BYTES:
+            await self._upload_part()
+
+    async def _upload_part(self):
+        if self._upload_id is None:
+            created = await run_in_threadpool(
+                s3_client.create_multipart_upload,
+                Bucket=AWS_S3_BUCKET_NAME, Key=self.key, ContentType=self.content_type
+            )
+            self._upload_id = created["UploadId"]
+        part_number = len(self._parts) + 1
+        body = bytes(self._buffer)
+        self._buffer.clear()
+        uploaded = await run_in_threadpool(
+            s3_client.upload_part,
+            Bucket=AWS_S3_BUCKET_NAME, Key=self.key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=body
         )
-        return url
+        self._parts.append({"PartNumber": part_number, "ETag": uploaded["ETag"]})
+
+    async def complete(self) -> str:
+        if self.size == 0:
+            raise Exception("Uploaded file is empty.")
+        if self._upload_id is None:
+            await run_in_threadpool(
+                s3_client.put_object,
+                Bucket=AWS_S3_BUCKET_NAME, Key=self.key, Body=bytes(self._buffer), ContentType=self.content_type
+            )
+        else:
+            if self._buffer:
+                await self._upload_part()
+            await run_in_threadpool(
+                s3_client.complete_multipart_upload,
+                Bucket=AWS_S3_BUCKET_NAME, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts}
+            )
+        self._buffer = bytearray()
+        return s3_object_url(self.key)
+
+    async def abort(self):
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            try:
+                await run_in_threadpool(
+                    s3_client.abort_multipart_upload,
+                    Bucket=AWS_S3_BUCKET_NAME, Key=self.key, UploadId=self._upload_id
+                )
+            except Exception as e:
+                print(f"Failed to abort multipart upload of {self.key}: {e}")
+
+
+async def stream_to_s3(chunks, key: str, content_type: str):
+    """Upload an (async or sync) iterable of byte chunks. Returns (url, size, sha256 hex)."""
+    upload = S3StreamingUpload(key, content_type)
+    try:
+        async for chunk in _aiter(chunks):
+            await upload.write(chunk)
+        url = await upload.complete()
+    except BaseException:
+        await upload.abort()
+        raise
+    return url, upload.size, upload.sha256.hexdigest()
+
+
+def content_key(folder: str, sha256: str, file_extension: str):
+    """Content-addressed key: the same bytes always map to the same object."""
+    return f"{folder}/{sha256}.{file_extension.lower()}"
+
+
+async def _record_uploads(objects):
+    """Register (key, sha256, size, content_type) in stored_objects for garbage collection."""
+    from utils.stored_objects import record_stored_objects
+
+    await record_stored_objects(objects)
+
+
+async def _upload_if_missing(chunks, rewind, folder, file_extension, content_type):
+    """
+    Two passes over the content: hash it (enforcing MAX_UPLOAD_BYTES), then stream it to S3
+    only if no object with that hash exists yet. rewind() returns a fresh chunk iterator.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    async for chunk in _aiter(chunks):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise upload_too_large()
+        digest.update(chunk)
+    if size == 0:
+        raise Exception("Uploaded file is empty.")
 
+    sha256 = digest.hexdigest()
+    key = content_key(folder, sha256, file_extension)
+    if await head_s3_object(key) is not None:
+        print(f"Skipped upload of {key}: already stored")
+        url = s3_object_url(key)
+    else:
+        url, size, _ = await stream_to_s3(await rewind(), key, content_type)
+        print(f"Uploaded {key} ({size} bytes)")
+    await _record_uploads([(key, sha256, size, content_type)])
+    return url
+
+
+async def _aiter(chunks):
+    if hasattr(chunks, "__aiter__"):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
+
+
+async def upload_image_to_s3(file: UploadFile, folder="products") -> str:
+    try:
+        if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+            raise upload_too_large()
+        file_extension = file.filename.split(".")[-1]
+
+        async def rewind():
+            await file.seek(0)
+            return iter_upload_file(file)
+
+        return await _upload_if_missing(iter_upload_file(file), rewind, folder, file_extension, file.content_type)
+
+    except HTTPException:
+        raise
     except NoCredentialsError:
         raise Exception("AWS credentials are invalid or not found")
     except Exception as e:
@@ -55,50 +270,163 @@ async def upload_image_to_s3(file: UploadFile, folder="products") -> str:
 
 async def upload_base64_image_to_s3(base64_image: str, file_extension: str = "jpg", folder="products") -> str:
     try:
-        import base64
-        
-        # Decode base64 string
-        if "base64," in base64_image:
-            base64_image = base64_image.split("base64,")[1]
-        
-        file_content = base64.b64decode(base64_image)
-        
-        if not file_content or len(file_content) == 0:
-            raise Exception("Decoded base64 image is empty.")
-        
-        unique_filename = f"{folder}/{uuid4().hex}.{file_extension}"
-        file_stream = BytesIO(file_content)
-        
-        # Map common file extensions to MIME types
-        content_type_map = {
-            "jpg": "image/jpeg",
-            "jpeg": "image/jpeg",
-            "png": "image/png",
-            "gif": "image/gif",
-            "webp": "image/webp",
-            "svg": "image/svg+xml",
-            "bmp": "image/bmp"
-        }
-        
+        check_base64_size(base64_image)
+
         # Get the appropriate content type or default to generic image
-        content_type = content_type_map.get(file_extension.lower(), f"image/{file_extension}")
-            
-        await run_in_threadpool(
-            s3_client.upload_fileobj,
-            file_stream,
-            AWS_S3_BUCKET_NAME,
-            unique_filename,
-            ExtraArgs={"ContentType": content_type}
-        )
+        content_type = CONTENT_TYPES.get(file_extension.lower(), f"image/{file_extension}")
 
-        url = (
-            f"{AWS_CLOUDFRONT_URL}/{unique_filename}"
-            if AWS_CLOUDFRONT_URL
-            else f"https://{AWS_S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{unique_filename}"
-        )
-        return url
+        async def rewind():
+            return iter_base64_chunks(base64_image)
 
+        return await _upload_if_missing(iter_base64_chunks(base64_image), rewind, folder, file_extension, content_type)
+
+    except (HTTPException, binascii.Error):
+        raise
     except NoCredentialsError:
         raise Exception("AWS credentials are invalid or not found")
     except Exception as e:
         raise Exception(f"Base64 image upload failed: {str(e)}")
+
+
+def s3_key_from_url(url: str):
+    """
+    Recover the object key from a URL returned by the upload helpers.
+
+    Only the path is used, so URLs stay recognized after the CloudFront or bucket domain
+    changes. Returns None for values that are not absolute URLs (e.g. text customizations).
+    """
+    parsed = urlparse(url)
+    if not parsed.scheme or not parsed.netloc:
+        return None
+    key = unquote(parsed.path.lstrip("/"))
+    # Path-style URLs (custom endpoints, s3.<region>.amazonaws.com/<bucket>/...) start with the bucket
+    if AWS_S3_BUCKET_NAME and key.startswith(AWS_S3_BUCKET_NAME + "/"):
+        key = key[len(AWS_S3_BUCKET_NAME) + 1:]
+    return key or None
+
+async def delete_s3_objects(keys):
+    """Best-effort removal of objects by key, in batches of 1000 (the DeleteObjects limit)."""
+    keys = list(keys)
+    for start in range(0, len(keys), 1000):
+        batch = keys[start:start + 1000]
+        try:
+            await run_in_threadpool(
+                s3_client.delete_objects,
+                Bucket=AWS_S3_BUCKET_NAME,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+            )
+        except Exception as e:
+            print(f"Failed to delete objects {batch}: {e}")
+
+async def _upload_concurrently(uploads, cleanup_keys=None):
+    """
+    Run upload coroutine factories concurrently and return their URLs in order.
+
+    At most S3_UPLOAD_CONCURRENCY uploads run at once; the first error is raised once all
+    have finished. cleanup_keys, if given, holds the key each upload writes (or None for
+    one that must be kept): on error the objects written by the uploads that did succeed
+    are deleted first, so a failed batch leaves no orphans behind.
+    """
+    semaphore = asyncio.Semaphore(S3_UPLOAD_CONCURRENCY)
+
+    async def upload(index, start_upload):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                url = await start_upload()
+            except Exception as e:
+                print(f"Image upload {index + 1}/{len(uploads)} failed after {(time.perf_counter() - started) * 1000:.0f} ms: {e}")
+                raise
+            print(f"Image upload {index + 1}/{len(uploads)} took {(time.perf_counter() - started) * 1000:.0f} ms: {url}")
+            return url
+
+    results = await asyncio.gather(
+        *(upload(i, start_upload) for i, start_upload in enumerate(uploads)),
+        return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        if cleanup_keys is not None:
+            written = [
+                key for key, result in zip(cleanup_keys, results)
+                if key and not isinstance(result, BaseException)
+            ]
+            if written:
+                print(f"Deleting {len(written)} objects uploaded by a failed batch: {written}")
+                await delete_s3_objects(written)
+        raise errors[0]
+    return results
+
+async def upload_bytes_to_s3(content: bytes, key: str, content_type: str, metadata=None) -> str:
+    """Upload already-encoded bytes under a given key and return the public URL."""
+    extra_args = {"ContentType": content_type, "CacheControl": "public, max-age=31536000, immutable"}
+    if metadata:
+        extra_args["Metadata"] = {name: str(value) for name, value in metadata.items()}
+    await run_in_threadpool(
+        s3_client.upload_fileobj,
+        BytesIO(content),
+        AWS_S3_BUCKET_NAME,
+        key,
+        ExtraArgs=extra_args
+    )
+    return s3_object_url(key)
+
+async def upload_objects_to_s3(objects):
+    """
+    Upload several (key, content, content_type, metadata) objects concurrently (see
+    _upload_concurrently) and register them in stored_objects.
+
+    If any upload fails, the ones that succeeded are deleted again unless their key was
+    already recorded in stored_objects (i.e. the object may be shared with other records).
+    When stored_objects cannot be read nothing is deleted, and garbage collection has to
+    pick up the leftovers instead.
+    """
+    from utils.stored_objects import recorded_stored_keys
+
+    keys = [key for key, _, _, _ in objects]
+    recorded = await recorded_stored_keys(keys)
+    urls = await _upload_concurrently(
+        [
+            lambda key=key, content=content, content_type=content_type, metadata=metadata:
+                upload_bytes_to_s3(content, key, content_type, metadata)
+            for key, content, content_type, metadata in objects
+        ],
+        cleanup_keys=None if recorded is None else [None if key in recorded else key for key in keys],
+    )
+    await _record_uploads([
+        (key, hashlib.sha256(content).hexdigest(), len(content), content_type)
+        for key, content, content_type, _ in objects
+    ])
+    return urls
+
+
+def create_presigned_upload(folder: str, file_extension: str):
+    """
+    Presigned POST form that lets a client upload one image straight to S3.
+
+    The key is generated here, and the policy pins the content type and caps the size at
+    MAX_DIRECT_UPLOAD_BYTES. Returns {"url", "fields", "key"}.
+    """
+    file_extension = file_extension.lower()
+    content_type = CONTENT_TYPES[file_extension]
+    key = f"{folder}/{uuid4().hex}.{file_extension}"
+    presigned = s3_client.generate_presigned_post(
+        Bucket=AWS_S3_BUCKET_NAME,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, MAX_DIRECT_UPLOAD_BYTES],
+        ],
+        ExpiresIn=PRESIGNED_UPLOAD_EXPIRES_SECONDS,
+    )
+    return {"url": presigned["url"], "fields": presigned["fields"], "key": key}
+
+async def head_s3_object(key: str):
+    """Metadata of an object (ContentLength, ContentType, ...), or None if it does not exist."""
+    try:
+        return await run_in_threadpool(s3_client.head_object, Bucket=AWS_S3_BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
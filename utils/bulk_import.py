@@ -0,0 +1,104 @@
+import io
+import csv
+import json
+import codecs
+
+# Rows validated and inserted per INSERT statement (and per commit) by the bulk product import
+BULK_IMPORT_BATCH_SIZE = 500
+
+# CSV cells holding nested values, given as JSON text
+CSV_JSON_COLUMNS = ("customization_options", "bulk_prices", "dimensions")
+
+
+def detect_import_format(content_type):
+    """Pick "csv" or "jsonl" from a Content-Type header, or None if it says neither."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        return "csv"
+    if media_type in ("application/x-ndjson", "application/jsonl", "application/x-jsonlines", "application/json-seq"):
+        return "jsonl"
+    return None
+
+
+async def iter_lines(chunks):
+    """
+    Yield (line_number, line) from an async iterator of UTF-8 byte chunks, without buffering the body.
+    A leading byte order mark (as written by Excel) is dropped.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_number = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield line_number + 1, pending.rstrip("\r")
+
+
+async def iter_jsonl_records(chunks):
+    """Yield (line_number, record, error) for every non-blank JSONL line."""
+    async for line_number, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, record, None
+
+
+async def iter_csv_records(chunks):
+    """
+    Yield (line_number, record, error) for every CSV row after the header line.
+
+    Quoted cells may contain newlines: lines are joined until the quotes balance.
+    Empty cells are left out and the CSV_JSON_COLUMNS cells are parsed as JSON.
+    """
+    header = None
+    record_lines = []
+    start_line = None
+    async for line_number, line in iter_lines(chunks):
+        if not record_lines:
+            if not line.strip():
+                continue
+            start_line = line_number
+        record_lines.append(line)
+        text = "\n".join(record_lines)
+        if text.count('"') % 2:
+            continue  # Inside a quoted cell that spans lines
+        record_lines = []
+
+        cells = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [cell.strip() for cell in cells]
+            continue
+        if len(cells) > len(header):
+            yield start_line, None, f"Expected {len(header)} columns, got {len(cells)}"
+            continue
+
+        record = {name: value for name, value in zip(header, cells) if value != ""}
+        try:
+            for column in CSV_JSON_COLUMNS:
+                if column in record:
+                    record[column] = json.loads(record[column])
+        except ValueError:
+            yield start_line, None, f"Column '{column}' must be valid JSON"
+            continue
+        yield start_line, record, None
+
+    if record_lines:
+        yield start_line, None, "Unterminated quoted value"
+
+
+def iter_import_records(chunks, import_format):
+    if import_format == "csv":
+        return iter_csv_records(chunks)
+    return iter_jsonl_records(chunks)
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from config import get_setting, READ_YOUR_WRITES_SECONDS
+
+# Default lifetime (seconds) of a cached response
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+# Upper bound on the number of cached responses kept per process (memory backend only)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# Prefix for every key written to a shared cache server
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "printdoot:cache:")
+# How long (seconds) CloudFront may reuse a response before revalidating it (s-maxage).
+# Browsers always revalidate (no-cache): a 304 costs one round trip, and a fresh copy
+# in the browser would otherwise hide the client's own writes
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+# After a tag is invalidated, entries carrying it are not stored again for this long: the
+# read that would refill them may come from a replica that has not caught up with the write
+CACHE_FILL_HOLDOFF_SECONDS = int(os.getenv("CACHE_FILL_HOLDOFF_SECONDS", str(READ_YOUR_WRITES_SECONDS)))
+# How long (seconds) a shared cache server is bypassed after a failed call
+CACHE_BACKOFF_SECONDS = int(os.getenv("CACHE_BACKOFF_SECONDS", "30"))
+
+_cache = None
+
+
+class CacheBackend(ABC):
+    """
+    Interface every cache backend implements.
+
+    Values must be JSON-serializable. Every entry is stored with a set of tags
+    (e.g. "categories", "banners") so admin routes can drop all responses built
+    from a table once their changes are committed. set() is a no-op for tags
+    invalidated within the last CACHE_FILL_HOLDOFF_SECONDS.
+    """
+
+    @abstractmethod
+    async def get(self, key):
+        ...
+
+    @abstractmethod
+    async def set(self, key, value, ttl=None, tags=()):
+        ...
+
+    @abstractmethod
+    async def delete(self, key):
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, *tags):
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process TTL cache with an LRU size bound. Used locally and when no cache server is configured."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, default_ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._invalidated_at = {}  # tag -> monotonic time of the last invalidation
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl=None, tags=()):
+        now = time.monotonic()
+        if any(now - self._invalidated_at.get(tag, float("-inf")) < CACHE_FILL_HOLDOFF_SECONDS for tag in tags):
+            return
+        self._remove(key)
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        self._entries[key] = (expires_at, value, tuple(tags))
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        # Evict the least recently used entries once over the size bound
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+    async def delete(self, key):
+        self._remove(key)
+
+    async def invalidate_tags(self, *tags):
+        for tag in tags:
+            self._invalidated_at[tag] = time.monotonic()
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache shared by every container through a Redis-protocol server (Redis, Valkey, ElastiCache).
+
+    Tags are Redis sets holding the keys written under them. The cache is best-effort:
+    if the server is unreachable, reads miss and writes are dropped instead of failing the request,
+    and the server is left alone for CACHE_BACKOFF_SECONDS so an outage doesn't add a socket
+    timeout to every request.
+    """
+
+    # Drops every key listed in a tag set and the set itself in one atomic step, so a key
+    # tagged while the tag is being invalidated cannot survive it. The entry keys are only
+    # known inside the script; Redis Cluster accepts them because every key of this backend
+    # shares one hash slot (see __init__)
+    _INVALIDATE_SCRIPT = """
+    -- KEYS: one tag set per tag, then one hold-off key per tag; ARGV: entry key prefix, hold-off seconds
+    local tags = #KEYS / 2
+    for i = 1, tags do
+        for _, key in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+            redis.call('DEL', ARGV[1] .. key)
+        end
+        redis.call('DEL', KEYS[i])
+        if tonumber(ARGV[2]) > 0 then
+            redis.call('SET', KEYS[tags + i], 1, 'EX', ARGV[2])
+        end
+    end
+    return 0
+    """
+
+    def __init__(self, url=None, prefix=CACHE_KEY_PREFIX, default_ttl=CACHE_TTL_SECONDS, client=None):
+        if client is None:
+            # Imported here so the redis client is only needed when a cache server is configured
+            import redis.asyncio as redis
+
+            client = redis.from_url(
+                url, decode_responses=True, socket_timeout=0.5, socket_connect_timeout=0.5
+            )
+        self.client = client
+        # Wrap the prefix in a Redis Cluster hash tag unless it has one: entries, tag sets and
+        # hold-off keys then hash to the same slot, which the invalidation script and the
+        # MULTI/EXEC in set() require on a cluster
+        if "{" not in prefix:
+            prefix = "{" + prefix.rstrip(":") + "}:"
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self._invalidate = self.client.register_script(self._INVALIDATE_SCRIPT)
+        self._down_until = 0.0
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def _tag_key(self, tag):
+        return f"{self.prefix}tag:{tag}"
+
+    def _holdoff_key(self, tag):
+        return f"{self.prefix}holdoff:{tag}"
+
+    def _available(self):
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, action, e):
+        self._down_until = time.monotonic() + CACHE_BACKOFF_SECONDS
+        print(f"Cache {action} failed, bypassing the cache for {CACHE_BACKOFF_SECONDS}s. Error: {e}")
+
+    async def get(self, key):
+        if not self._available():
+            return None
+        try:
+            value = await self.client.get(self._key(key))
+        except Exception as e:
+            self._failed(f"get for {key}", e)
+            return None
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key, value, ttl=None, tags=()):
+        if not self._available():
+            return
+        ttl = ttl if ttl is not None else self.default_ttl
+        try:
+            if tags and await self.client.exists(*(self._holdoff_key(tag) for tag in tags)):
+                return
+            # MULTI/EXEC, so an invalidation never sees the entry without its tags
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.set(self._key(key), json.dumps(value), ex=ttl)
+                for tag in tags:
+                    pipe.sadd(self._tag_key(tag), key)
+                    # Tag sets must outlive the entries they point to
+                    pipe.expire(self._tag_key(tag), max(ttl, self.default_ttl))
+                await pipe.execute()
+        except Exception as e:
+            self._failed(f"set for {key}", e)
+
+    async def delete(self, key):
+        if not self._available():
+            return
+        try:
+            await self.client.delete(self._key(key))
+        except Exception as e:
+            self._failed(f"delete for {key}", e)
+
+    async def invalidate_tags(self, *tags):
+        # Invalidation is attempted even while backing off: a missed one leaves stale entries
+        try:
+            await self._invalidate(
+                keys=[*(self._tag_key(tag) for tag in tags), *(self._holdoff_key(tag) for tag in tags)],
+                args=[self.prefix, CACHE_FILL_HOLDOFF_SECONDS],
+            )
+        except Exception as e:
+            self._failed(f"invalidation for tags {tags}", e)
+
+
+def get_cache():
+    """
+    Return the configured cache backend from the CACHE_URL setting:
+    redis:// or rediss:// for a shared server, memory:// (the default) for an in-process
+    cache that needs no server, e.g. for local development and offline runs.
+
+    fakeredis:// runs the Redis backend (Lua script, pipelines, tag sets) against an
+    in-process fake server, so it can be checked offline; it needs
+    `pip install "fakeredis[lua]"` and, like memory://, is not shared between processes.
+    """
+    global _cache
+    if _cache is None:
+        cache_url = get_setting("CACHE_URL", "memory://")
+        if cache_url.startswith(("redis://", "rediss://")):
+            _cache = RedisCacheBackend(cache_url)
+        elif cache_url.startswith("fakeredis://"):
+            from fakeredis import aioredis
+
+            _cache = RedisCacheBackend(client=aioredis.FakeRedis(decode_responses=True))
+        elif cache_url.startswith("memory://"):
+            _cache = MemoryCacheBackend()
+        else:
+            raise ValueError(f"Unsupported CACHE_URL '{cache_url}', expected memory://, redis:// or fakeredis://")
+    return _cache
+
+
+def make_cache_key(request: Request):
+    """Build a cache key from the route path and its (sorted) query parameters."""
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def to_cacheable(response_model, payload):
+    """
+    Validate a route payload against its response model and build a cache entry.
+
+    The entry holds the plain JSON body and its ETag, so a cached response can be
+    revalidated without serializing it again.
+    """
+    body = jsonable_encoder(response_model.parse_obj(payload))
+    serialized = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    etag = '"' + hashlib.sha256(serialized.encode()).hexdigest()[:32] + '"'
+    return {"etag": etag, "body": body}
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" matches "x" (CloudFront weakens ETags when it compresses)
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def conditional_response(request: Request, entry, max_age=HTTP_CACHE_MAX_AGE):
+    """Return 304 if the client already has this entry, otherwise the JSON body with caching headers."""
+    headers = {
+        "ETag": entry["etag"],
+        "Cache-Control": f"public, no-cache, s-maxage={max_age}",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(entry["body"], headers=headers)
@@ -0,0 +1,76 @@
+import io
+import csv
+import json
+from datetime import datetime
+from sqlalchemy import select
+from models import Product, Category
+from utils.bulk_import import CSV_JSON_COLUMNS
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 500
+
+# Exported columns, in CSV order. The import columns come first, so an export can be
+# fed back to POST /admin/products/bulk.
+EXPORT_COLUMNS = [
+    Product.product_id, Product.name, Product.price, Product.category_id, Product.description,
+    Product.customization_options, Product.bulk_prices, Product.dimensions, Product.weight,
+    Product.material, Product.status, Product.main_image_url, Product.side_images_url,
+    Product.average_rating, Product.review_count, Product.rating_1_count, Product.rating_2_count,
+    Product.rating_3_count, Product.rating_4_count, Product.rating_5_count, Product.created_at,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS] + ["category_name"]
+
+
+def build_export_query():
+    """Products with their category names, in id order, as plain rows (no ORM objects to track)."""
+    return (
+        select(*EXPORT_COLUMNS, Category.name.label("category_name"))
+        .join(Category, Category.id == Product.category_id)
+        .order_by(Product.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def _export_record(row):
+    record = dict(row._mapping)
+    if record["status"] is not None:
+        record["status"] = record["status"].value
+    if isinstance(record["created_at"], datetime):
+        record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+def format_ndjson(rows):
+    return "".join(json.dumps(_export_record(row)) + "\n" for row in rows)
+
+
+def format_csv(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        record = _export_record(row)
+        writer.writerow([
+            json.dumps(record[field]) if field in CSV_JSON_COLUMNS + ("side_images_url",) and record[field] is not None
+            else record[field]
+            for field in EXPORT_FIELDS
+        ])
+    return buffer.getvalue()
+
+
+async def stream_catalog(session, export_format):
+    """
+    Yield the catalog as CSV or NDJSON text, one chunk per EXPORT_BATCH_SIZE rows.
+
+    Rows come from a server-side cursor, so memory use does not grow with the catalog.
+    The session is closed when the stream ends or the client goes away.
+    """
+    try:
+        if export_format == "csv":
+            yield format_csv([], header=True)
+        result = await session.stream(build_export_query())
+        async for rows in result.partitions():
+            yield format_csv(rows) if export_format == "csv" else format_ndjson(rows)
+    finally:
+        await session.close()
@@ -6,6 +6,7 @@ from models import Product, OrderItem, Order, User, UserDetails
 from sqlalchemy.future import select
 import sqlalchemy as sa
 from sqlalchemy.orm import selectinload
+from utils.images import variant_url
 
 
 async def send_owner_email(order_id: str, total_price: int, clerk_id: str, db: AsyncSession):
@@ -50,7 +51,7 @@ async def send_owner_email(order_id: str, total_price: int, clerk_id: str, db: A
     {customer_details}
     <p>Click <a href="http://printdoot.com/admin/orders">here</a> to view the order details.</p>
     """
-    send_email(owner_email, subject, body)
+    await send_email(owner_email, subject, body)
 
 
 async def send_customer_email(custom_order_id: str, clerk_id: str, total_price: int, db: AsyncSession):
@@ -92,6 +93,10 @@ async def send_customer_email(custom_order_id: str, clerk_id: str, total_price:
         product = product_result.scalar()
 
         if product:
+            # Small thumbnail variant instead of the full-size image
+            thumbnail_url = variant_url(
+                (product.image_variants or {}).get("main"), "thumb", fallback=product.main_image_url
+            )
             body += f"""
             <li>
                 <strong>Product Name:</strong> {product.name} <br>
@@ -99,11 +104,11 @@ async def send_customer_email(custom_order_id: str, clerk_id: str, total_price:
                 <strong>Price:</strong> {item.individual_price} <br>
                 <strong>Quantity:</strong> {item.quantity} <br>
                 <strong>Customization:</strong> {item.user_customization_type}: {item.user_customization_value} <br>
-                <strong>Image:</strong> <img src="{product.main_image_url}" alt="{product.name}" width="100" height="100"> <br>
+                <strong>Image:</strong> <img src="{thumbnail_url}" alt="{product.name}" width="100" height="100"> <br>
             </li>
             """
 
     body += "</ul>"
 
     # Send the email using your helper function (assuming send_email is defined)
-    send_email(customer_email, subject, body)
+    await send_email(customer_email, subject, body)
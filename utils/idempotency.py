@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+from datetime import timedelta
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import and_, delete, func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# How long a stored result is replayed before the key can be used again
+IDEMPOTENCY_TTL_HOURS = 24
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# A request still marked in progress after this long is assumed dead (e.g. a Lambda timeout)
+# and its key can be claimed again
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+# Response headers not worth replaying
+_SKIPPED_HEADERS = {"content-length", "set-cookie", "date", "server"}
+
+# Keys are only honored for requests with these bodies. Other bodies (multipart uploads, the
+# CSV/JSONL bulk import) are streamed by their routes and would have to be buffered here to
+# be fingerprinted, so those requests pass through untouched.
+IDEMPOTENT_CONTENT_TYPES = ("application/json",)
+
+
+def idempotency_scope(request: Request):
+    """
+    Namespace of a key: the method and path, plus the caller's credentials when it sends
+    any, so two clients (or two routes) choosing the same key never collide.
+    """
+    digest = hashlib.sha256()
+    for part in (request.method, request.url.path, request.headers.get("authorization", "")):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _has_idempotent_body(request: Request):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    return not content_type or content_type in IDEMPOTENT_CONTENT_TYPES
+
+
+def request_fingerprint(request: Request, body: bytes):
+    digest = hashlib.sha256()
+    for part in (request.method, request.url.path, request.url.query):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+async def claim_idempotency_key(db: AsyncSession, scope: str, key: str, request_hash: str):
+    """
+    Atomically reserve a key for this request. Returns None if the caller should run the
+    request, otherwise the existing IdempotencyKey row. Expired rows and abandoned
+    in-progress rows are taken over.
+    """
+    expires_at = func.now() + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    stmt = insert(IdempotencyKey).values(scope=scope, key=key, request_hash=request_hash, expires_at=expires_at)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "response_status": None,
+            "response_headers": None,
+            "response_body": None,
+            "created_at": func.now(),
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=or_(
+            IdempotencyKey.expires_at < func.now(),
+            and_(
+                IdempotencyKey.response_status.is_(None),
+                IdempotencyKey.created_at < func.now() - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+            ),
+        ),
+    ).returning(IdempotencyKey.key)
+    result = await db.execute(stmt)
+    claimed = result.scalar_one_or_none()
+    await db.commit()
+    if claimed is not None:
+        return None
+
+    result = await db.execute(
+        select(IdempotencyKey).filter(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+    )
+    return result.scalars().first()
+
+
+async def idempotency_middleware(request: Request, call_next):
+    """
+    Replay the stored response of a mutation retried with the same Idempotency-Key.
+
+    The first request with a key runs normally and its response is stored (server errors
+    are not, so they can be retried). A retry with the same request gets the stored
+    response with an Idempotent-Replayed header; a retry while the first one is still
+    running gets 409; reusing a key for a different request gets 422. Keys are scoped by
+    idempotency_scope and only honored for JSON (or empty) bodies.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key or request.method in ("GET", "HEAD", "OPTIONS") or not _has_idempotent_body(request):
+        return await call_next(request)
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return JSONResponse({"detail": f"{IDEMPOTENCY_HEADER} is too long"}, status_code=400)
+
+    from config import get_sessionmaker
+
+    scope = idempotency_scope(request)
+    request_hash = request_fingerprint(request, await request.body())
+    async with get_sessionmaker()() as db:
+        existing = await claim_idempotency_key(db, scope, key, request_hash)
+
+    if existing is not None:
+        if existing.request_hash != request_hash:
+            return JSONResponse(
+                {"detail": f"{IDEMPOTENCY_HEADER} was already used for a different request"}, status_code=422
+            )
+        if existing.response_status is None:
+            return JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"},
+                status_code=409, headers={"Retry-After": "1"}
+            )
+        headers = dict(existing.response_headers or {})
+        headers["Idempotent-Replayed"] = "true"
+        return Response(existing.response_body, status_code=existing.response_status, headers=headers)
+
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    except BaseException:
+        await _release_key(scope, key)
+        raise
+
+    if response.status_code >= 500:
+        await _release_key(scope, key)
+    else:
+        headers = {
+            name: value for name, value in response.headers.items() if name.lower() not in _SKIPPED_HEADERS
+        }
+        async with get_sessionmaker()() as db:
+            await db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+                .values(response_status=response.status_code, response_headers=headers, response_body=body)
+            )
+            await db.commit()
+
+    async def replay_body():
+        yield body
+
+    response.body_iterator = replay_body()
+    return response
+
+
+async def _release_key(scope: str, key: str):
+    """Forget a key whose request failed so the client can retry it."""
+    from config import get_sessionmaker
+
+    try:
+        async with get_sessionmaker()() as db:
+            await db.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"Failed to release idempotency key {key}: {e}")
+
+
+async def purge_expired_idempotency_keys(db: AsyncSession):
+    """Delete expired keys. Returns the number of rows removed."""
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now()))
+    await db.commit()
+    return result.rowcount
+
+
+async def main():
+    from config import get_sessionmaker
+
+    async with get_sessionmaker()() as db:
+        purged = await purge_expired_idempotency_keys(db)
+    print(f"Purged {purged} expired idempotency keys")
+
+
+# Run with: python -m utils.idempotency
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,203 @@
+import base64
+import hashlib
+from io import BytesIO
+from PIL import Image, ImageOps
+from starlette.concurrency import run_in_threadpool
+from utils.aws import (
+    CONTENT_TYPES, content_key, head_s3_object, s3_object_url
+)
+from utils.stored_objects import record_stored_objects, touch_stored_objects
+
+# Responsive variant widths in pixels. Images are never upscaled: variants wider than the
+# original share the original-width rendition.
+IMAGE_VARIANT_WIDTHS = {
+    "thumb": 160,
+    "card": 480,
+    "detail": 1024,
+    "zoom": 2048,
+}
+
+# Output formats: name -> (Pillow format, content type, save options)
+IMAGE_VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Part of every variant key; bump when sizes or encoder settings change so old renditions
+# are not reused
+IMAGE_VARIANTS_VERSION = "v1"
+
+# The variant stored in main_image_url / side_images_url for clients that ignore variants
+DEFAULT_VARIANT = ("jpeg", "detail")
+
+
+def decode_base64_image(base64_image: str) -> bytes:
+    if "base64," in base64_image:
+        base64_image = base64_image.split("base64,")[1]
+    return base64.b64decode(base64_image)
+
+
+# Errors Pillow raises for content it cannot decode: unknown formats (UnidentifiedImageError is
+# an OSError), truncated or corrupt files, and oversized images
+UNREADABLE_IMAGE_ERRORS = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)
+
+
+def variant_sizes(width: int, height: int):
+    """{variant: (width, height)} for an upright image of the given size."""
+    sizes = {}
+    for name, target_width in IMAGE_VARIANT_WIDTHS.items():
+        variant_width = min(target_width, width)
+        sizes[name] = (variant_width, max(1, round(height * variant_width / width)))
+    return sizes
+
+
+def upright_size(content: bytes):
+    """Size of an image once rotated by its EXIF orientation, read from the header only."""
+    with Image.open(BytesIO(content)) as image:
+        width, height = image.size
+        # Orientations 5-8 are rotated by 90 or 270 degrees
+        if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            width, height = height, width
+    return width, height
+
+
+def render_variants(content: bytes):
+    """
+    Decode an image once and encode every variant.
+
+    The image is rotated according to its EXIF orientation, and the re-encoded variants
+    carry no EXIF (camera, GPS) data. Returns {format: {variant: (width, height, bytes)}}.
+    Raises one of UNREADABLE_IMAGE_ERRORS for content Pillow cannot read (e.g. SVG or a
+    truncated JPEG).
+    """
+    with Image.open(BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    if has_alpha:
+        # JPEG has no alpha channel: flatten onto white
+        opaque = Image.new("RGB", image.size, (255, 255, 255))
+        opaque.paste(image, mask=image.getchannel("A"))
+    else:
+        opaque = image
+
+    variants = {fmt: {} for fmt in IMAGE_VARIANT_FORMATS}
+    encoded = {}  # (format, width) -> (width, height, bytes)
+    for name, (width, height) in variant_sizes(image.width, image.height).items():
+        for fmt, (pil_format, _, options) in IMAGE_VARIANT_FORMATS.items():
+            if (fmt, width) not in encoded:
+                source = opaque if pil_format == "JPEG" else image
+                if width != source.width:
+                    source = source.resize((width, height), Image.Resampling.LANCZOS)
+                buffer = BytesIO()
+                source.save(buffer, pil_format, **options)
+                encoded[(fmt, width)] = (width, height, buffer.getvalue())
+            variants[fmt][name] = encoded[(fmt, width)]
+    return variants
+
+
+def _variant_key(folder, sha256, fmt, name):
+    return f"{folder}/{sha256}/{IMAGE_VARIANTS_VERSION}/{name}.{fmt}"
+
+
+async def _find_stored_variants(content, folder, sha256):
+    """
+    Variants already uploaded for this content, or None.
+
+    Checks stored_objects instead of S3: a variant set is only recorded once all of its
+    uploads succeeded. Touching the rows also protects them from garbage collection.
+    Sizes come from the image header, so nothing is decoded.
+    """
+    names = [(fmt, name) for fmt in IMAGE_VARIANT_FORMATS for name in IMAGE_VARIANT_WIDTHS]
+    keys = [_variant_key(folder, sha256, fmt, name) for fmt, name in names]
+    if len(await touch_stored_objects(keys)) != len(keys):
+        return None
+    try:
+        sizes = variant_sizes(*upright_size(content))
+    except UNREADABLE_IMAGE_ERRORS:
+        return None
+    variants = {fmt: {} for fmt in IMAGE_VARIANT_FORMATS}
+    for (fmt, name), key in zip(names, keys):
+        width, height = sizes[name]
+        variants[fmt][name] = {"url": s3_object_url(key), "width": width, "height": height}
+    return variants
+
+
+async def prepare_image_variants(content: bytes, folder="products"):
+    """
+    Render the variants of an image (in a worker thread) without uploading them.
+
+    Keys derive from the SHA-256 of the source image, {folder}/{sha256}/{version}/{size}.{format},
+    so re-uploading the same image renders and uploads nothing.
+    Returns (objects, variants): objects is the list of (key, bytes, content_type, metadata)
+    still missing from S3, for upload_objects_to_s3; variants is
+    {format: {variant: {"url", "width", "height"}}}.
+    Returns None if the content is not a raster image Pillow can decode, so the caller
+    can store the original instead.
+    """
+    sha256 = hashlib.sha256(content).hexdigest()
+    existing = await _find_stored_variants(content, folder, sha256)
+    if existing is not None:
+        print(f"Skipped rendering {folder}/{sha256}: variants already stored")
+        return [], existing
+
+    try:
+        rendered = await run_in_threadpool(render_variants, content)
+    except UNREADABLE_IMAGE_ERRORS as e:
+        print(f"Storing {folder}/{sha256} without variants, the image could not be decoded: {e}")
+        return None
+
+    objects = []
+    variants = {}
+    for fmt, by_name in rendered.items():
+        content_type = IMAGE_VARIANT_FORMATS[fmt][1]
+        variants[fmt] = {}
+        for name, (width, height, data) in by_name.items():
+            key = _variant_key(folder, sha256, fmt, name)
+            objects.append((key, data, content_type, {"width": width, "height": height, "source-sha256": sha256}))
+            variants[fmt][name] = {"url": s3_object_url(key), "width": width, "height": height}
+    return objects, variants
+
+
+async def prepare_image_upload(content: bytes, file_extension: str = "jpg", folder="products"):
+    """
+    Prepare one uploaded image for S3: its variants, or the original bytes if it has none.
+
+    Returns (objects, url, variants) where objects are the ones still to upload, url is the
+    default variant (or the original) and variants is None for originals.
+    """
+    prepared = await prepare_image_variants(content, folder)
+    if prepared is not None:
+        objects, variants = prepared
+        fmt, name = DEFAULT_VARIANT
+        return objects, variants[fmt][name]["url"], variants
+
+    sha256 = hashlib.sha256(content).hexdigest()
+    key = content_key(folder, sha256, file_extension)
+    content_type = CONTENT_TYPES.get(file_extension.lower(), f"image/{file_extension}")
+    if await head_s3_object(key) is not None:
+        await record_stored_objects([(key, sha256, len(content), content_type)])
+        return [], s3_object_url(key), None
+    return [(key, content, content_type, None)], s3_object_url(key), None
+
+
+def variant_url(variants, name, fmt="jpeg", fallback=None):
+    """URL of one variant, or fallback when the image has no variants."""
+    try:
+        return variants[fmt][name]["url"]
+    except (KeyError, TypeError):
+        return fallback
+
+
+def build_srcset(variants):
+    """{format: "url 160w, url 480w, ..."} for an <img srcset> / <source srcset>, or None."""
+    if not variants:
+        return None
+    srcset = {}
+    for fmt, by_name in variants.items():
+        seen = {}
+        for variant in sorted(by_name.values(), key=lambda v: v["width"]):
+            seen.setdefault(variant["width"], variant["url"])
+        srcset[fmt] = ", ".join(f"{url} {width}w" for width, url in seen.items())
+    return srcset
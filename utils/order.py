@@ -1,4 +1,10 @@
 import string
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import order_number_seq
+
+# S3 folder for customer images attached to order items (checkout uploads and direct uploads)
+CUSTOMIZATION_IMAGE_FOLDER = "orders"
 
 def generate_order_id(counter: int):
     letters_part = counter // 99999 
@@ -15,3 +21,9 @@ def generate_order_id(counter: int):
     letters_code = number_to_letters(letters_part)
     order_id = f"PRNTDT-{letters_code}{str(numbers_part).zfill(5)}"
     return order_id
+
+
+async def allocate_order_id(db: AsyncSession):
+    """Next order ID, numbered from order_number_seq so concurrent checkouts never collide."""
+    result = await db.execute(select(order_number_seq.next_value()))
+    return generate_order_id(result.scalar_one())
@@ -0,0 +1,182 @@
+import time
+import binascii
+from datetime import timedelta
+from fastapi import HTTPException
+from sqlalchemy import delete, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models import OrderItem, OutboxEvent
+from utils.aws import upload_base64_image_to_s3
+from utils.email_helpers import send_owner_email, send_customer_email
+from utils.order import CUSTOMIZATION_IMAGE_FOLDER
+
+# Events claimed per round trip
+OUTBOX_BATCH_SIZE = 20
+# A claimed event is hidden from other workers this long; if its worker dies (e.g. a Lambda
+# timeout) the event becomes due again afterwards
+OUTBOX_LEASE_SECONDS = 300
+# Retries back off exponentially from the base delay up to the cap; after the last attempt
+# the event is marked failed and left for inspection
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_RETRY_MAX_SECONDS = 3600
+# Errors a retry cannot fix (e.g. an image over the size limit, bad base64 data, a deleted
+# user): the event is marked failed on the first one
+OUTBOX_PERMANENT_ERRORS = (HTTPException, binascii.Error)
+# Processed events are kept this long before purge_processed_outbox_events removes them
+OUTBOX_RETENTION_DAYS = 7
+
+
+class OutboxRetry(Exception):
+    """Raised by a handler whose event is not ready yet; it is retried with the usual backoff."""
+
+
+def enqueue_event(db: AsyncSession, event_type: str, payload: dict):
+    """
+    Add an event to the caller's transaction. It is only visible to the worker once the
+    caller commits, so a rolled-back order never sends an email.
+    """
+    db.add(OutboxEvent(event_type=event_type, payload=payload))
+
+
+def retry_delay(attempts: int):
+    return min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+
+
+# Handlers run with their own session and must not commit: whatever they write is committed
+# together with the event being marked done. A handler may return a replacement payload,
+# e.g. to drop image data that is no longer needed.
+
+async def _customization_images_pending(db: AsyncSession, order_id: str):
+    result = await db.execute(
+        select(OutboxEvent.id)
+        .where(
+            OutboxEvent.event_type == "order.customization_image",
+            OutboxEvent.status == "pending",
+            OutboxEvent.payload["order_id"].astext == order_id,
+        )
+        .limit(1)
+    )
+    return result.first() is not None
+
+
+async def handle_customization_image(db: AsyncSession, payload: dict):
+    url = await upload_base64_image_to_s3(
+        payload["image"], file_extension=payload["extension"], folder=CUSTOMIZATION_IMAGE_FOLDER
+    )
+    await db.execute(
+        update(OrderItem)
+        .where(OrderItem.id == payload["order_item_id"])
+        .values(user_customization_value=url)
+    )
+    return {key: value for key, value in payload.items() if key != "image"} | {"url": url}
+
+
+async def handle_owner_email(db: AsyncSession, payload: dict):
+    # Emails link the customization images, so wait for their uploads
+    if await _customization_images_pending(db, payload["order_id"]):
+        raise OutboxRetry("Customization images are still being uploaded")
+    await send_owner_email(payload["order_id"], payload["total_price"], payload["clerk_id"], db)
+
+
+async def handle_customer_email(db: AsyncSession, payload: dict):
+    if await _customization_images_pending(db, payload["order_id"]):
+        raise OutboxRetry("Customization images are still being uploaded")
+    await send_customer_email(payload["order_id"], payload["clerk_id"], payload["total_price"], db)
+
+
+OUTBOX_HANDLERS = {
+    "order.customization_image": handle_customization_image,
+    "order.owner_email": handle_owner_email,
+    "order.customer_email": handle_customer_email,
+}
+
+
+async def claim_events(db: AsyncSession, limit: int = OUTBOX_BATCH_SIZE):
+    """
+    Lease up to `limit` due events. FOR UPDATE SKIP LOCKED lets several workers drain the
+    outbox at once without picking the same event. Returns [(id, event_type, payload, attempts)].
+    """
+    due = (
+        select(OutboxEvent.id)
+        .where(OutboxEvent.status == "pending", OutboxEvent.available_at <= func.now())
+        .order_by(OutboxEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(due))
+        .values(
+            attempts=OutboxEvent.attempts + 1,
+            available_at=func.now() + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+        )
+        .returning(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.payload, OutboxEvent.attempts)
+    )
+    events = sorted(result.all(), key=lambda row: row.id)
+    await db.commit()
+    return events
+
+
+async def process_event(event_id: int, event_type: str, payload: dict, attempts: int):
+    """Run one claimed event and record the outcome. Returns "done", "retry" or "failed"."""
+    from config import get_sessionmaker
+
+    async with get_sessionmaker()() as db:
+        try:
+            handler = OUTBOX_HANDLERS.get(event_type)
+            if handler is None:
+                raise ValueError(f"No handler for outbox event type '{event_type}'")
+            new_payload = await handler(db, payload)
+        except Exception as e:
+            await db.rollback()
+            permanent = isinstance(e, OUTBOX_PERMANENT_ERRORS)
+            outcome = "failed" if permanent or attempts >= OUTBOX_MAX_ATTEMPTS else "retry"
+            detail = e.detail if isinstance(e, HTTPException) else e
+            values = {"last_error": f"{type(e).__name__}: {detail}"[:1000]}
+            if outcome == "failed":
+                values.update(status="failed", processed_at=func.now())
+            else:
+                values["available_at"] = func.now() + timedelta(seconds=retry_delay(attempts))
+            await db.execute(update(OutboxEvent).where(OutboxEvent.id == event_id).values(**values))
+            await db.commit()
+            print(f"Outbox event {event_id} ({event_type}) attempt {attempts} failed, {outcome}: {detail}")
+            return outcome
+
+        values = {"status": "done", "processed_at": func.now(), "last_error": None}
+        if new_payload is not None:
+            values["payload"] = new_payload
+        await db.execute(update(OutboxEvent).where(OutboxEvent.id == event_id).values(**values))
+        await db.commit()
+        return "done"
+
+
+async def drain_outbox(deadline: float = None, batch_size: int = OUTBOX_BATCH_SIZE):
+    """
+    Process due events until none are left or time.monotonic() passes `deadline`.
+    Returns the number of events per outcome.
+    """
+    from config import get_sessionmaker
+
+    counts = {"done": 0, "retry": 0, "failed": 0}
+    while deadline is None or time.monotonic() < deadline:
+        async with get_sessionmaker()() as db:
+            events = await claim_events(db, batch_size)
+        if not events:
+            break
+        for event in events:
+            counts[await process_event(*event)] += 1
+    return counts
+
+
+async def purge_processed_outbox_events(db: AsyncSession, retention_days: int = OUTBOX_RETENTION_DAYS):
+    """Delete events that were done more than `retention_days` ago. Failed events are kept."""
+    result = await db.execute(
+        delete(OutboxEvent).where(
+            OutboxEvent.status == "done",
+            OutboxEvent.processed_at < func.now() - timedelta(days=retention_days),
+        )
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,53 @@
+import json
+import base64
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last returned row into an opaque URL-safe cursor."""
+    encoded = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [
+            datetime.fromisoformat(v["dt"]) if isinstance(v, dict) and "dt" in v else v
+            for v in values
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_cursor(query, order_columns, cursor, descending=False):
+    """
+    Order a query by order_columns (the last one must be unique, e.g. the primary key)
+    and, when a cursor is given, continue right after the row it points to.
+
+    An empty cursor starts from the first page.
+    """
+    query = query.order_by(*(column.desc() if descending else column.asc() for column in order_columns))
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(order_columns):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        key = tuple_(*order_columns)
+        query = query.filter(key < tuple(values) if descending else key > tuple(values))
+    return query
+
+
+def paginate_rows(rows, limit, order_columns):
+    """
+    Trim rows fetched with LIMIT limit + 1 to one page and build the cursor for the next one.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in order_columns])
@@ -0,0 +1,139 @@
+from bisect import bisect_right
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models import Product, Coupon, ProductStatus
+
+
+class PriceTiers:
+    """
+    A product's bulk-price tiers compiled for lookup by quantity.
+
+    Tiers are sorted by min_quantity once; unit_price() then finds the tier for a quantity
+    with a binary search. Quantities outside every tier pay the product's base price.
+    """
+
+    __slots__ = ("base_price", "min_quantities", "max_quantities", "prices")
+
+    def __init__(self, base_price, bulk_prices=None):
+        tiers = sorted(
+            (tier["min_quantity"], tier.get("max_quantity"), tier["price"]) for tier in (bulk_prices or [])
+        )
+        self.base_price = base_price
+        self.min_quantities = [min_quantity for min_quantity, _, _ in tiers]
+        self.max_quantities = [max_quantity for _, max_quantity, _ in tiers]
+        self.prices = [price for _, _, price in tiers]
+
+    def unit_price(self, quantity: int):
+        index = bisect_right(self.min_quantities, quantity) - 1
+        if index >= 0:
+            max_quantity = self.max_quantities[index]
+            if max_quantity is None or quantity <= max_quantity:
+                return self.prices[index]
+        return self.base_price
+
+
+def coupon_applies(coupon, product_id: str, category_id: int):
+    """A coupon without product or category restrictions applies to every line."""
+    if not coupon.applicable_products and not coupon.applicable_categories:
+        return True
+    return (
+        product_id in (coupon.applicable_products or [])
+        or category_id in (coupon.applicable_categories or [])
+    )
+
+
+async def find_coupon(db: AsyncSession, code: str):
+    """Return (coupon, None) for an active, unexpired code, or (None, reason)."""
+    result = await db.execute(select(Coupon).filter(Coupon.code == code, Coupon.active == 1))
+    coupon = result.scalars().first()
+    if not coupon:
+        return None, "Invalid or inactive coupon code"
+    if coupon.expires_at and coupon.expires_at < datetime.now():
+        return None, "Coupon has expired"
+    return coupon, None
+
+
+async def load_price_tiers(db: AsyncSession, product_ids):
+    """
+    Load and compile the pricing of a set of products in one query.
+
+    Returns {product_id: (PriceTiers, category_id)}. Raises 400 for missing or
+    discontinued products.
+    """
+    product_ids = set(product_ids)
+    result = await db.execute(
+        select(Product.product_id, Product.price, Product.bulk_prices, Product.category_id, Product.status)
+        .where(Product.product_id.in_(product_ids))
+    )
+    pricing = {}
+    discontinued = set()
+    for product_id, price, bulk_prices, category_id, product_status in result.all():
+        if product_status == ProductStatus.discontinued:
+            discontinued.add(product_id)
+        pricing[product_id] = (PriceTiers(price, bulk_prices), category_id)
+
+    missing_products = product_ids - set(pricing)
+    if missing_products:
+        raise HTTPException(status_code=400, detail=f"Products with IDs {missing_products} do not exist")
+    if discontinued:
+        raise HTTPException(status_code=400, detail=f"Products with IDs {discontinued} are discontinued")
+    return pricing
+
+
+def price_cart(items, pricing, coupon=None):
+    """
+    Price (product_id, quantity) lines in one pass.
+
+    Lines are priced at their tier's unit price; the coupon's percentage comes off each line
+    it applies to, rounded down to whole currency units. Returns a dict with per-line
+    unit_price, line_total and discount plus subtotal, discount and total.
+    """
+    lines = []
+    subtotal = 0
+    total_discount = 0
+    for product_id, quantity in items:
+        tiers, category_id = pricing[product_id]
+        unit_price = tiers.unit_price(quantity)
+        line_total = unit_price * quantity
+        discount = 0
+        if coupon is not None and coupon_applies(coupon, product_id, category_id):
+            discount = line_total * coupon.discount_percentage // 100
+        lines.append({
+            "product_id": product_id,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "line_total": line_total,
+            "discount": discount,
+        })
+        subtotal += line_total
+        total_discount += discount
+    return {
+        "lines": lines,
+        "subtotal": subtotal,
+        "discount": total_discount,
+        "total": subtotal - total_discount,
+    }
+
+
+async def quote_cart(db: AsyncSession, items, coupon_code=None):
+    """
+    Price a cart of (product_id, quantity) lines from the database.
+
+    Returns price_cart's result plus coupon_code and coupon_message (why a given code
+    was not applied, if it wasn't).
+    """
+    for _, quantity in items:
+        if quantity <= 0:
+            raise HTTPException(status_code=400, detail=f"Quantity must be positive (got {quantity})")
+
+    pricing = await load_price_tiers(db, (product_id for product_id, _ in items))
+    coupon, coupon_message = (None, None)
+    if coupon_code:
+        coupon, coupon_message = await find_coupon(db, coupon_code)
+
+    quote = price_cart(items, pricing, coupon)
+    quote["coupon_code"] = coupon.code if coupon else None
+    quote["coupon_message"] = coupon_message
+    return quote
@@ -0,0 +1,43 @@
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import CategoryProductCounter
+
+# How many times a generated product ID is retried when it collides with an existing one
+# (e.g. a manually chosen ID, or two categories sharing the same 3-letter prefix).
+PRODUCT_ID_ATTEMPTS = 5
+
+
+def product_id_prefix(category_name: str):
+    return f"PRNTDT{category_name.upper()[:3]}"
+
+
+def format_product_id(category_name: str, number: int):
+    return f"{product_id_prefix(category_name)}{number:03d}"
+
+
+async def allocate_product_numbers(db: AsyncSession, category_id: int, count: int = 1):
+    """
+    Reserve the next `count` product numbers of a category and return them as a range.
+
+    A single upsert on the category's counter row, so concurrent callers never get the
+    same number. The row stays locked until the caller's transaction ends, and numbers
+    are not reused if that transaction rolls back.
+    """
+    stmt = (
+        insert(CategoryProductCounter)
+        .values(category_id=category_id, last_number=count)
+        .on_conflict_do_update(
+            index_elements=[CategoryProductCounter.category_id],
+            set_={"last_number": CategoryProductCounter.last_number + count},
+        )
+        .returning(CategoryProductCounter.last_number)
+    )
+    result = await db.execute(stmt)
+    last_number = result.scalar_one()
+    return range(last_number - count + 1, last_number + 1)
+
+
+async def allocate_product_ids(db: AsyncSession, category, count: int = 1):
+    """Reserve `count` generated product IDs (PRNTDT{ABBR}{n:03d}) for a category."""
+    numbers = await allocate_product_numbers(db, category.id, count)
+    return [format_product_id(category.name, number) for number in numbers]
@@ -0,0 +1,50 @@
+from fastapi import HTTPException
+
+
+def validate_product_fields(product, category):
+    """
+    Check a product's customization options against its category's allowed_customizations
+    and sanity-check its bulk prices. Raises HTTPException(400) describing the first problem.
+    """
+    if product.customization_options:
+        if category.allowed_customizations:
+            allowed_keys = set(category.allowed_customizations.keys())
+            provided_keys = set(product.customization_options.keys())
+            if not provided_keys.issubset(allowed_keys):
+                invalid_keys = provided_keys - allowed_keys
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Customization option keys {invalid_keys} are not allowed for category {category.name}"
+                )
+            for key in provided_keys:
+                allowed_values = set(category.allowed_customizations.get(key, {}).keys())
+                provided_values = set(product.customization_options.get(key, {}).keys())
+                if not provided_values.issubset(allowed_values):
+                    invalid_values = provided_values - allowed_values
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Values {invalid_values} for customization '{key}' are not allowed for category {category.name}"
+                    )
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Category {category.name} does not allow customization options."
+            )
+
+    if product.bulk_prices:
+        for bulk_price in product.bulk_prices:
+            if bulk_price.min_quantity <= 0:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Minimum quantity must be positive (got {bulk_price.min_quantity})"
+                )
+            if bulk_price.max_quantity is not None and bulk_price.max_quantity <= bulk_price.min_quantity:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Maximum quantity ({bulk_price.max_quantity}) must be greater than minimum quantity ({bulk_price.min_quantity})"
+                )
+            if bulk_price.price < 0:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Price must be non-negative (got {bulk_price.price})"
+                )
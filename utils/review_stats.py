@@ -0,0 +1,80 @@
+import asyncio
+from sqlalchemy import Float, cast, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models import Product, ProductReview
+
+
+MIN_RATING = 1
+MAX_RATING = 5
+
+
+def rating_count_column(rating: int):
+    """The Product histogram column counting reviews with the given star rating."""
+    return getattr(Product, f"rating_{rating}_count")
+
+
+async def apply_review_rating(db: AsyncSession, product_id: str, rating: int, delta: int = 1):
+    """
+    Add (delta=1) or remove (delta=-1) one review's rating from a product's aggregates.
+
+    A single UPDATE that derives the new values from the current row, so it is O(1),
+    safe under concurrent reviews and part of the caller's transaction.
+    Returns the number of products updated (0 if the product does not exist).
+    """
+    histogram_column = rating_count_column(rating)
+    new_count = Product.review_count + delta
+    new_sum = Product.rating_sum + delta * rating
+    result = await db.execute(
+        update(Product)
+        .where(Product.product_id == product_id)
+        .values({
+            Product.review_count: new_count,
+            Product.rating_sum: new_sum,
+            histogram_column: histogram_column + delta,
+            Product.average_rating: func.coalesce(cast(new_sum, Float) / func.nullif(new_count, 0), 0),
+        })
+    )
+    return result.rowcount
+
+
+async def recompute_review_stats(db: AsyncSession):
+    """
+    Recompute the denormalized review aggregates of every product from product_reviews.
+
+    The aggregates are normally kept up to date by the review handlers; this repairs them
+    after manual data fixes or a bug. Returns the number of products updated.
+    """
+    def aggregate(expression):
+        return (
+            select(func.coalesce(expression, 0))
+            .where(ProductReview.product_id == Product.product_id)
+            .scalar_subquery()
+        )
+
+    values = {
+        Product.review_count: aggregate(func.count(ProductReview.id)),
+        Product.rating_sum: aggregate(func.sum(ProductReview.rating)),
+        Product.average_rating: aggregate(func.avg(ProductReview.rating)),
+    }
+    for star in range(MIN_RATING, MAX_RATING + 1):
+        values[rating_count_column(star)] = aggregate(
+            func.count(ProductReview.id).filter(ProductReview.rating == star)
+        )
+
+    result = await db.execute(update(Product).values(values))
+    await db.commit()
+    return result.rowcount
+
+
+async def main():
+    from config import get_sessionmaker
+
+    async with get_sessionmaker()() as db:
+        updated = await recompute_review_stats(db)
+    print(f"Recomputed review stats for {updated} products")
+
+
+# Run with: python -m utils.review_stats
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+import re
+from sqlalchemy import func, or_
+from models import Product
+
+# Text search configuration used by the products.search_vector trigger (see migration 7c2e9f4b1d63)
+SEARCH_CONFIG = "english"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_prefix_tsquery(term: str):
+    """
+    Turn free text into a tsquery string where every word is matched as a prefix,
+    e.g. "blue mu" -> "blue:* & mu:*". Returns None if the term has no searchable words.
+    """
+    tokens = _TOKEN_RE.findall(term.lower())
+    if not tokens:
+        return None
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def apply_product_search(query, term: str):
+    """
+    Filter a Product query by a search term and return (query, rank).
+
+    A product matches if its search_vector (name, category name, material, description)
+    contains every word as a prefix, or if its name is trigram-similar to the term,
+    which tolerates typos. rank orders results by relevance.
+    """
+    term = term.strip()
+    similarity = func.similarity(Product.name, term)
+    fuzzy_match = Product.name.op("%")(term)
+
+    tsquery_text = build_prefix_tsquery(term)
+    if tsquery_text is None:
+        return query.filter(fuzzy_match), similarity
+
+    tsquery = func.to_tsquery(SEARCH_CONFIG, tsquery_text)
+    full_text_match = Product.search_vector.op("@@")(tsquery)
+    rank = func.ts_rank_cd(Product.search_vector, tsquery) + similarity
+    return query.filter(or_(full_text_match, fuzzy_match)), rank
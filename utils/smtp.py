@@ -1,4 +1,7 @@
+import asyncio
 import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import os
@@ -6,33 +9,123 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-# Get email details from environment variables
-GMAIL_USER = os.getenv("GMAIL_USER")  # Example: your email (e.g., example@gmail.com)
-GMAIL_PASSWORD = os.getenv("GMAIL_PASSWORD")  # Your Gmail App Password or actual password
+# SMTP server. For local debugging point it at a server that just prints the messages, e.g.
+# SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=false with `python -m aiosmtpd -n -l localhost:1025`;
+# login is skipped when GMAIL_PASSWORD is not set.
+# The account itself comes from the GMAIL_USER (e.g. example@gmail.com) and GMAIL_PASSWORD
+# (a Gmail App Password) settings, read through config.get_setting so SSM can provide them.
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes", "on")
+SMTP_TIMEOUT_SECONDS = int(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+# A connection idle longer than this is closed rather than reused (servers drop idle
+# sessions, and a frozen Lambda container may resume much later)
+SMTP_IDLE_SECONDS = int(os.getenv("SMTP_IDLE_SECONDS", "60"))
+# A connection used more recently than this is trusted without a NOOP round trip
+SMTP_NOOP_AFTER_SECONDS = int(os.getenv("SMTP_NOOP_AFTER_SECONDS", "5"))
 
-def send_email(to_email: str, subject: str, body: str):
+# All SMTP work happens on this single thread, which owns the pooled connection; the event
+# loop only awaits the result
+_smtp_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+_server = None
+_last_used = 0.0
+
+
+def _close_connection():
+    global _server
+    if _server is not None:
+        try:
+            _server.quit()
+        except (smtplib.SMTPException, OSError):
+            _server.close()
+        _server = None
+
+
+def _credentials():
+    """(user, password) for the SMTP login, from the environment or SSM."""
+    from config import get_setting
+
+    return get_setting("GMAIL_USER"), get_setting("GMAIL_PASSWORD")
+
+
+def _get_connection():
+    """The pooled, logged-in connection; reconnects if it sat idle too long or was dropped."""
+    global _server, _last_used
+    if _server is not None:
+        idle = time.monotonic() - _last_used
+        if idle > SMTP_IDLE_SECONDS:
+            _close_connection()
+        elif idle > SMTP_NOOP_AFTER_SECONDS:
+            try:
+                if _server.noop()[0] != 250:
+                    _close_connection()
+            except (smtplib.SMTPException, OSError):
+                _close_connection()
+
+    if _server is None:
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            if SMTP_STARTTLS:
+                server.starttls()
+            user, password = _credentials()
+            if password:
+                server.login(user, password)
+        except BaseException:
+            server.close()
+            raise
+        _server = server
+        _last_used = time.monotonic()
+    return _server
+
+
+def _build_message(sender: str, to_email: str, subject: str, body: str):
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+
+def _send_messages(messages):
+    """Runs on the SMTP thread. Returns None or the exception for each message."""
+    global _last_used
+    sender, _ = _credentials()
+    results = []
+    for to_email, subject, body in messages:
+        msg = _build_message(sender, to_email, subject, body)
+        try:
+            try:
+                _get_connection().sendmail(sender, to_email, msg.as_string())
+            except smtplib.SMTPServerDisconnected:
+                # The server closed the pooled connection since the last check: reconnect once
+                _close_connection()
+                _get_connection().sendmail(sender, to_email, msg.as_string())
+            _last_used = time.monotonic()
+            print(f"Email sent to {to_email}")
+            results.append(None)
+        except (smtplib.SMTPException, OSError) as e:
+            print(f"Failed to send email to {to_email}. Error: {e}")
+            if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                _close_connection()
+            results.append(e)
+    return results
+
+
+async def send_emails(messages):
+    """
+    Send several (to_email, subject, body) HTML emails over one pooled SMTP session.
+    Returns None or the exception for each message, in order.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_smtp_executor, _send_messages, list(messages))
+
+
+async def send_email(to_email: str, subject: str, body: str):
     """
-    Function to send email using Gmail SMTP server
+    Send one HTML email without blocking the event loop. Raises if delivery fails, so the
+    outbox worker retries it.
     """
-    try:
-        # Set up the server and login to the Gmail account
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(GMAIL_USER, GMAIL_PASSWORD)
-
-        # Create the email content
-        msg = MIMEMultipart()
-        msg['From'] = GMAIL_USER
-        msg['To'] = to_email
-        msg['Subject'] = subject
-
-        # Add the body of the email
-        msg.attach(MIMEText(body, 'html'))
-
-        # Send the email
-        server.sendmail(GMAIL_USER, to_email, msg.as_string())
-        server.quit()
-
-        print(f"Email sent to {to_email}")
-    except Exception as e:
-        print(f"Failed to send email to {to_email}. Error: {e}")
+    [error] = await send_emails([(to_email, subject, body)])
+    if error is not None:
+        raise error
@@ -0,0 +1,186 @@
+import asyncio
+import argparse
+from datetime import timedelta
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models import StoredObject, Product, Category, Banner, OrderItem
+
+# Objects uploaded or re-used more recently than this are never collected, so an upload
+# whose record is not committed yet is safe
+STORED_OBJECT_GRACE_HOURS = 24
+# A sweep that would delete more than this share of the candidates is refused unless forced:
+# it more likely means referenced_keys stopped recognizing stored URLs than real garbage
+STORED_OBJECT_MAX_GARBAGE_FRACTION = 0.5
+
+
+async def record_stored_objects(objects):
+    """
+    Upsert (key, sha256, size, content_type) rows into stored_objects and bump last_seen_at.
+
+    Runs in its own short session so it can be called from the upload helpers. Best effort:
+    an object that is not recorded is simply never garbage collected.
+    """
+    if not objects:
+        return
+    from config import get_sessionmaker
+
+    rows = {}
+    for key, sha256, size, content_type in objects:
+        if key:
+            rows[key] = {"key": key, "sha256": sha256, "size": size, "content_type": content_type}
+    stmt = insert(StoredObject).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StoredObject.key],
+        set_={
+            "last_seen_at": func.now(),
+            "sha256": func.coalesce(stmt.excluded.sha256, StoredObject.sha256),
+            "size": func.coalesce(stmt.excluded.size, StoredObject.size),
+        },
+    )
+    try:
+        async with get_sessionmaker()() as db:
+            await db.execute(stmt)
+            await db.commit()
+    except Exception as e:
+        print(f"Failed to record stored objects {list(rows)}: {e}")
+
+
+async def touch_stored_objects(keys):
+    """
+    Bump last_seen_at of the recorded keys among `keys` and return them as a set.
+
+    One UPDATE ... RETURNING, so a key returned here cannot be collected by a sweep
+    that starts afterwards. Best effort: returns an empty set if the database is unreachable.
+    """
+    if not keys:
+        return set()
+    from config import get_sessionmaker
+
+    try:
+        async with get_sessionmaker()() as db:
+            result = await db.execute(
+                update(StoredObject)
+                .where(StoredObject.key.in_(keys))
+                .values(last_seen_at=func.now())
+                .returning(StoredObject.key)
+            )
+            touched = set(result.scalars().all())
+            await db.commit()
+    except Exception as e:
+        print(f"Failed to touch stored objects {keys}: {e}")
+        return set()
+    return touched
+
+
+async def recorded_stored_keys(keys):
+    """The keys among `keys` that have a stored_objects row, or None if the database cannot be read."""
+    if not keys:
+        return set()
+    from config import get_sessionmaker
+
+    try:
+        async with get_sessionmaker()() as db:
+            result = await db.execute(select(StoredObject.key).where(StoredObject.key.in_(keys)))
+            return set(result.scalars().all())
+    except Exception as e:
+        print(f"Failed to look up stored objects {keys}: {e}")
+        return None
+
+
+def _collect_urls(value, urls):
+    """Every string found in a (possibly nested) JSON value."""
+    if isinstance(value, str):
+        urls.add(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_urls(item, urls)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_urls(item, urls)
+
+
+async def referenced_keys(db: AsyncSession):
+    """Keys of every S3 object some database row points at."""
+    from utils.aws import s3_key_from_url
+
+    urls = set()
+    queries = [
+        select(Product.main_image_url, Product.side_images_url, Product.image_variants),
+        select(Category.image_url),
+        select(Banner.image_url),
+        select(OrderItem.user_customization_value),
+    ]
+    for query in queries:
+        result = await db.stream(query.execution_options(yield_per=1000))
+        async for row in result:
+            _collect_urls(tuple(row), urls)
+    return {key for key in (s3_key_from_url(url) for url in urls) if key}
+
+
+async def collect_garbage(
+    db: AsyncSession,
+    grace_hours: int = STORED_OBJECT_GRACE_HOURS,
+    dry_run: bool = False,
+    force: bool = False,
+):
+    """
+    Delete stored objects no row references any more (mark and sweep).
+
+    Only objects not uploaded or re-used within grace_hours are considered. Rows are deleted
+    first, re-checking last_seen_at, and only the keys actually removed are deleted from S3,
+    so an object re-used during the sweep survives. Returns the keys deleted (or that would
+    be, with dry_run). Raises RuntimeError if more than STORED_OBJECT_MAX_GARBAGE_FRACTION
+    of the candidates look unreferenced, unless force is set.
+    """
+    from utils.aws import delete_s3_objects
+
+    cutoff = func.now() - timedelta(hours=grace_hours)
+    result = await db.execute(select(StoredObject.key).filter(StoredObject.last_seen_at < cutoff))
+    candidates = set(result.scalars().all())
+    if not candidates:
+        return []
+
+    garbage = sorted(candidates - await referenced_keys(db))
+    if len(garbage) > len(candidates) * STORED_OBJECT_MAX_GARBAGE_FRACTION and not force:
+        raise RuntimeError(
+            f"{len(garbage)} of {len(candidates)} candidate objects look unreferenced; refusing to sweep. "
+            "Check referenced_keys against the stored URLs, then re-run with force."
+        )
+    if dry_run or not garbage:
+        return garbage
+
+    deleted = []
+    for start in range(0, len(garbage), 1000):
+        result = await db.execute(
+            delete(StoredObject)
+            .where(StoredObject.key.in_(garbage[start:start + 1000]), StoredObject.last_seen_at < cutoff)
+            .returning(StoredObject.key)
+        )
+        deleted.extend(result.scalars().all())
+    await db.commit()
+    await delete_s3_objects(deleted)
+    return sorted(deleted)
+
+
+async def main():
+    from config import get_sessionmaker
+
+    parser = argparse.ArgumentParser(description="Delete S3 objects that no database row references")
+    parser.add_argument("--grace-hours", type=int, default=STORED_OBJECT_GRACE_HOURS)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--force", action="store_true", help="sweep even if most candidates look unreferenced")
+    args = parser.parse_args()
+
+    async with get_sessionmaker()() as db:
+        garbage = await collect_garbage(db, grace_hours=args.grace_hours, dry_run=args.dry_run, force=args.force)
+    action = "Would delete" if args.dry_run else "Deleted"
+    print(f"{action} {len(garbage)} unreferenced objects")
+    for key in garbage:
+        print(f"  {key}")
+
+
+# Run with: python -m utils.stored_objects [--dry-run] [--force]
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+import os
+import asyncio
+import re
+import time
+from bisect import bisect_left, insort
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models import Product, Category, ShopByNeed
+
+# How long (seconds) the index is trusted before a full rebuild. Admin changes made in
+# this process are applied immediately; the rebuild picks up changes made by other containers.
+SUGGEST_REFRESH_SECONDS = int(os.getenv("SUGGEST_REFRESH_SECONDS", "600"))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str):
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+class SuggestIndex:
+    """
+    In-memory prefix index of product names, category names and shop-by-need tags.
+
+    Entries live in a sorted list searched with bisect. Every label is indexed from the
+    start of each of its words, so "mu" matches both "Mug" and "Blue Mug".
+    """
+
+    def __init__(self):
+        self._entries = []  # sorted (key, word_position, kind, ref, label)
+        self._loaded_at = None
+
+    @property
+    def is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > SUGGEST_REFRESH_SECONDS
+
+    def _make_entries(self, kind, ref, label):
+        words = normalize(label).split(" ")
+        return [(" ".join(words[i:]), i, kind, str(ref), label) for i in range(len(words)) if words[i]]
+
+    def build(self, items):
+        """Replace the whole index with (kind, ref, label) items."""
+        entries = []
+        for kind, ref, label in items:
+            entries.extend(self._make_entries(kind, ref, label))
+        entries.sort()
+        self._entries = entries
+        self._loaded_at = time.monotonic()
+
+    def upsert(self, kind, ref, label):
+        self.remove(kind, ref)
+        for entry in self._make_entries(kind, ref, label):
+            insort(self._entries, entry)
+
+    def remove(self, kind, ref):
+        ref = str(ref)
+        self._entries = [e for e in self._entries if not (e[2] == kind and e[3] == ref)]
+
+    def search(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        matches = {}
+        start = bisect_left(self._entries, (prefix,))
+        # Bound the scan so one-letter prefixes stay fast on large catalogs
+        for key, position, kind, ref, label in self._entries[start:start + limit * 50]:
+            if not key.startswith(prefix):
+                break
+            best = matches.get((kind, ref))
+            if best is None or position < best[0]:
+                matches[(kind, ref)] = (position, label)
+
+        # Labels that start with the prefix come before mid-label word matches
+        ranked = sorted(matches.items(), key=lambda item: (item[1][0] > 0, item[1][1].lower()))
+        return [
+            {"text": label, "type": kind, "ref": ref}
+            for (kind, ref), (_, label) in ranked[:limit]
+        ]
+
+
+suggest_index = SuggestIndex()
+_rebuild_lock = None  # Created on first use, inside the running event loop
+
+
+async def ensure_suggest_index():
+    """
+    Return the index, building it from the database on first use and whenever it goes stale.
+    A session is only opened for the rebuild, so fresh-index lookups never touch Postgres.
+    """
+    if not suggest_index.is_stale:
+        return suggest_index
+
+    global _rebuild_lock
+    if _rebuild_lock is None:
+        _rebuild_lock = asyncio.Lock()
+    async with _rebuild_lock:
+        # Another request may have rebuilt it while this one waited
+        if suggest_index.is_stale:
+            from config import open_read_session
+
+            async with await open_read_session() as db:
+                await _rebuild(db)
+    return suggest_index
+
+
+async def _rebuild(db: AsyncSession):
+    products = await db.execute(select(Product.product_id, Product.name))
+    categories = await db.execute(select(Category.id, Category.name))
+    needs = await db.execute(select(ShopByNeed.need).distinct())
+
+    items = [("product", product_id, name) for product_id, name in products.all()]
+    items += [("category", category_id, name) for category_id, name in categories.all()]
+    items += [("need", need, need) for (need,) in needs.all()]
+    suggest_index.build(items)
@@ -0,0 +1,75 @@
+import os
+import argparse
+import asyncio
+import time
+from utils.idempotency import purge_expired_idempotency_keys
+from utils.outbox import drain_outbox, purge_processed_outbox_events
+from utils.stored_objects import collect_garbage
+
+# Stop claiming new outbox events this long before the Lambda timeout
+LAMBDA_TIME_MARGIN_SECONDS = 15
+
+# Unattended S3 garbage collection is off unless explicitly enabled; run
+# `python -m utils.stored_objects --dry-run` by hand and check its output first
+WORKER_COLLECT_GARBAGE = os.getenv("WORKER_COLLECT_GARBAGE", "false").lower() in ("1", "true", "yes", "on")
+
+# Lambda keeps the container (and its database connections) between invocations, so reuse
+# one event loop instead of asyncio.run creating a new one each time
+_loop = asyncio.new_event_loop()
+
+
+async def run_maintenance():
+    """Housekeeping run on a slower schedule than the outbox drain."""
+    from config import get_sessionmaker
+
+    async with get_sessionmaker()() as db:
+        result = {
+            "idempotency_keys_purged": await purge_expired_idempotency_keys(db),
+            "outbox_events_purged": await purge_processed_outbox_events(db),
+        }
+        if WORKER_COLLECT_GARBAGE:
+            result["objects_deleted"] = len(await collect_garbage(db))
+    return result
+
+
+def handler(event, context):
+    """
+    Scheduled Lambda entry point, deployed next to main.handler.
+    The event's "task" is "drain" (default) to process the outbox, or "maintenance".
+    """
+    task = (event or {}).get("task", "drain")
+    if task == "maintenance":
+        result = _loop.run_until_complete(run_maintenance())
+    elif task == "drain":
+        remaining_seconds = context.get_remaining_time_in_millis() / 1000
+        deadline = time.monotonic() + remaining_seconds - LAMBDA_TIME_MARGIN_SECONDS
+        result = _loop.run_until_complete(drain_outbox(deadline=deadline))
+    else:
+        raise ValueError(f"Unknown worker task '{task}'")
+    print(f"Worker {task}: {result}")
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Drain the outbox (order emails, customization uploads)")
+    parser.add_argument("--loop", action="store_true", help="keep polling instead of exiting when the outbox is empty")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between polls with --loop")
+    parser.add_argument("--maintenance", action="store_true", help="purge expired rows (and unreferenced S3 objects if WORKER_COLLECT_GARBAGE is set), then exit")
+    args = parser.parse_args()
+
+    if args.maintenance:
+        print(await run_maintenance())
+        return
+
+    while True:
+        counts = await drain_outbox()
+        if any(counts.values()):
+            print(f"Outbox: {counts}")
+        if not args.loop:
+            break
+        await asyncio.sleep(args.interval)
+
+
+# Run with: python worker.py [--loop] [--maintenance]
+if __name__ == "__main__":
+    asyncio.run(main())